@@ -0,0 +1,110 @@
+"""Bounded thread pool for password hashing.
+
+PBKDF2 releases the GIL, so a few threads hash in parallel while request threads stay free for
+captcha traffic. Admission is bounded: once ``workers + max_queue`` hashes are running or
+waiting in this process, new ones are rejected with :class:`HashingBusy` (a 503 with
+``Retry-After``) instead of queueing without limit behind a login storm.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from captcha_backend.metrics import Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+HASH_SECONDS = Histogram("password_hash_seconds", "Time spent hashing or checking a password, by operation.")
+QUEUE_WAIT_SECONDS = Histogram("password_hash_queue_wait_seconds", "Time a password hash waited for a free worker.")
+QUEUE_DEPTH = Gauge("password_hash_queue_depth", "Password hashes waiting for a free worker.")
+REJECTED = Counter("password_hash_rejected_total", "Password hashes rejected because the queue was full.")
+
+
+class HashingBusy(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHashingPool:
+    def __init__(self, workers: int, max_queue: int, retry_after: int = 1) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = max(1, retry_after)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork; a child process starts its own pool.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            self._pid = pid
+            self._pending = 0
+        return self._executor
+
+    def _queue_depth(self) -> None:
+        QUEUE_DEPTH.set(max(0, self._pending - self.workers))
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._queue_depth()
+
+    def submit(self, op: str, func: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.workers + self.max_queue:
+                REJECTED.inc(op=op)
+                raise HashingBusy(self.retry_after)
+            self._pending += 1
+            self._queue_depth()
+        enqueued = time.perf_counter()
+
+        def task() -> T:
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued, op=op)
+            with HASH_SECONDS.time(op=op):
+                return func(*args, **kwargs)
+
+        future = executor.submit(task)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, op: str, func: Callable[..., T], *args, **kwargs) -> T:
+        return self.submit(op, func, *args, **kwargs).result()
+
+    async def arun(self, op: str, func: Callable[..., T], *args, **kwargs) -> T:
+        return await asyncio.wrap_future(self.submit(op, func, *args, **kwargs))
+
+
+def busy_response(exc: HashingBusy) -> JsonResponse:
+    response = JsonResponse({"success": False, "message": "服务器繁忙，请稍后重试"}, status=503)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+_pool: Optional[PasswordHashingPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> PasswordHashingPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    workers=settings.PASSWORD_HASH_WORKERS,
+                    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+                    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+                )
+    return _pool
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator
+
+from django.conf import settings
+from django.contrib.auth import alogin, authenticate, get_user_model, login
+from django.contrib.auth.hashers import make_password
+from django.http import HttpRequest
+
+from activity.services import alog_captcha_event, log_captcha_event
+from captcha_api.services import CaptchaVerifier
+from captcha_api.token_store import get_token_store
+from captcha_backend.metrics import Counter, Histogram
+
+from .hashing import get_hashing_pool
+
+MODEL_BACKEND = "django.contrib.auth.backends.ModelBackend"
+UNKNOWN_USER_PREFIX = "login-unknown-user"
+
+STAGE_SECONDS = Histogram("login_stage_seconds", "Time spent in each stage of a captcha login.")
+USER_LOOKUPS = Counter("login_user_lookups_total", "Login user lookups by result (found, missing, cached_missing).")
+
+
+def unknown_user_key(username: str) -> str:
+    return f"{UNKNOWN_USER_PREFIX}:{hashlib.blake2b(username.encode(), digest_size=16).hexdigest()}"
+
+
+@dataclass
+class LoginResult:
+    success: bool
+    message: str
+    status: int = 200
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.timings.items())
+
+
+class LoginService:
+    """Captcha login that reads the user row once and reuses it for the log entry and password check.
+
+    Each stage is recorded in ``login_stage_seconds`` and returned for a ``Server-Timing`` header.
+    Only the default ``ModelBackend`` is short-circuited; other backends still go through
+    ``authenticate``. Unknown usernames are remembered in the token store, which every worker
+    shares, so creating the user clears the entry for all of them.
+    """
+
+    @staticmethod
+    def _direct() -> bool:
+        return list(settings.AUTHENTICATION_BACKENDS) == [MODEL_BACKEND]
+
+    @staticmethod
+    @contextmanager
+    def _stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = time.perf_counter() - started
+            STAGE_SECONDS.observe(timings[name], stage=name)
+
+    @staticmethod
+    def _lookup(username: str):
+        key = unknown_user_key(username)
+        store = get_token_store()
+        if store.get(key) is not None:
+            USER_LOOKUPS.inc(result="cached_missing")
+            return None
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            store.set_many({key: b"1"}, settings.LOGIN_UNKNOWN_USER_TTL)
+        USER_LOOKUPS.inc(result="found" if user is not None else "missing")
+        return user
+
+    @staticmethod
+    async def _alookup(username: str):
+        key = unknown_user_key(username)
+        store = get_token_store()
+        if await store.aget(key) is not None:
+            USER_LOOKUPS.inc(result="cached_missing")
+            return None
+        user = await get_user_model().objects.filter(username=username).afirst()
+        if user is None:
+            await store.aset_many({key: b"1"}, settings.LOGIN_UNKNOWN_USER_TTL)
+        USER_LOOKUPS.inc(result="found" if user is not None else "missing")
+        return user
+
+    @staticmethod
+    def _check_password(user, password: str) -> bool:
+        if user is None:
+            # Hash anyway so response time does not reveal whether the username exists.
+            make_password(password)
+            return False
+        return user.check_password(password) and user.is_active
+
+    @staticmethod
+    def login(
+        request: HttpRequest, username: str, password: str, captcha_token: str, captcha_answer: object
+    ) -> LoginResult:
+        """May raise ``HashingBusy`` when the password hashing pool is saturated."""
+        timings: Dict[str, float] = {}
+        stage = LoginService._stage
+        with stage(timings, "captcha"):
+            success, captcha_type, message = CaptchaVerifier.verify(captcha_token, captcha_answer)
+        user = None
+        if success:
+            with stage(timings, "lookup"):
+                user = LoginService._lookup(username)
+        with stage(timings, "log"):
+            log_captcha_event(
+                request=request,
+                captcha_type=captcha_type,
+                result="success" if success else "failed",
+                message=message,
+                user_id=user.id if user is not None else None,
+            )
+        if not success:
+            return LoginResult(False, message, 400, timings)
+
+        with stage(timings, "password"):
+            if LoginService._direct():
+                valid = get_hashing_pool().run("check", LoginService._check_password, user, password)
+            else:
+                user = get_hashing_pool().run("check", authenticate, request, username=username, password=password)
+                valid = user is not None
+        if not valid:
+            return LoginResult(False, "账号或密码错误", 400, timings)
+
+        with stage(timings, "session"):
+            login(request, user, backend=MODEL_BACKEND if LoginService._direct() else None)
+        return LoginResult(True, "登录成功", 200, timings)
+
+    @staticmethod
+    async def alogin(
+        request: HttpRequest, username: str, password: str, captcha_token: str, captcha_answer: object
+    ) -> LoginResult:
+        timings: Dict[str, float] = {}
+        stage = LoginService._stage
+        with stage(timings, "captcha"):
+            success, captcha_type, message = await CaptchaVerifier.averify(captcha_token, captcha_answer)
+        user = None
+        if success:
+            with stage(timings, "lookup"):
+                user = await LoginService._alookup(username)
+        with stage(timings, "log"):
+            await alog_captcha_event(
+                request=request,
+                captcha_type=captcha_type,
+                result="success" if success else "failed",
+                message=message,
+                user_id=user.id if user is not None else None,
+            )
+        if not success:
+            return LoginResult(False, message, 400, timings)
+
+        with stage(timings, "password"):
+            if LoginService._direct():
+                valid = await get_hashing_pool().arun("check", LoginService._check_password, user, password)
+            else:
+                user = await get_hashing_pool().arun(
+                    "check", authenticate, request, username=username, password=password
+                )
+                valid = user is not None
+        if not valid:
+            return LoginResult(False, "账号或密码错误", 400, timings)
+
+        with stage(timings, "session"):
+            await alogin(request, user, backend=MODEL_BACKEND if LoginService._direct() else None)
+        return LoginResult(True, "登录成功", 200, timings)
@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from captcha_api.token_store import get_token_store
+
+from .services import unknown_user_key
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_unknown_username(sender, instance, **kwargs):
+    # A login attempt may have cached this username as unknown just before it was created or renamed.
+    username = instance.username
+    transaction.on_commit(lambda: get_token_store().delete(unknown_user_key(username)))
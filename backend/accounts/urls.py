@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+login_view = views.alogin_with_captcha if settings.CAPTCHA_ASYNC_VIEWS else views.login_with_captcha
+
 urlpatterns = [
     path("register", views.register, name="register"),
-    path("login", views.login_with_captcha, name="login"),
+    path("login", login_view, name="login"),
 ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import CaptchaLog, CaptchaType, SceneImage
+from .models import CaptchaLogEntry, CaptchaLogRollup, CaptchaType, SceneImage
 
 
 @admin.register(CaptchaType)
@@ -11,13 +11,21 @@ class CaptchaTypeAdmin(admin.ModelAdmin):
 
 @admin.register(SceneImage)
 class SceneImageAdmin(admin.ModelAdmin):
-    list_display = ("category", "file_path")
+    list_display = ("category", "file_path", "width", "height")
     list_filter = ("category",)
+    readonly_fields = ("width", "height", "content_hash", "thumbnail_path")
 
 
-@admin.register(CaptchaLog)
+@admin.register(CaptchaLogEntry)
 class CaptchaLogAdmin(admin.ModelAdmin):
-    list_display = ("captcha_type", "user", "ip", "result", "access_time")
-    list_filter = ("captcha_type", "result")
-    search_fields = ("user__username", "captcha_type", "ip")
-    readonly_fields = ("access_time",)
+    list_display = ("captcha_type", "user", "ip_address", "result", "message", "access_time")
+    list_filter = ("captcha_type", "result", "reason")
+    search_fields = ("user__username",)
+    readonly_fields = ("access_time", "ip_address")
+    exclude = ("ip",)
+
+
+@admin.register(CaptchaLogRollup)
+class CaptchaLogRollupAdmin(admin.ModelAdmin):
+    list_display = ("granularity", "bucket_start", "captcha_type", "result", "total")
+    list_filter = ("granularity", "captcha_type", "result")
@@ -0,0 +1,126 @@
+"""Conversion of the legacy string-column ``captcha_logs`` table into ``captcha_log_entries``.
+
+Rows are read with raw SQL in primary-key ranges (``--source`` may name any table with the
+legacy columns), so each batch is an index range scan and a run can be resumed from the last
+id it reported. Converted rows keep their legacy ids, which makes re-runs idempotent: ids that
+already exist in the compact table are skipped.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterator, List, Optional, Tuple
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CaptchaLog, CaptchaLogEntry
+
+LEGACY_TABLE = CaptchaLog._meta.db_table
+LEGACY_FIELDS = ("id", "user_id", "captcha_type", "ip", "access_time", "result", "message")
+
+
+def _aware(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        # Django stores UTC when USE_TZ is on; SQLite hands the text back without an offset.
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def legacy_id_range(source: str = LEGACY_TABLE) -> Tuple[int, int]:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {connection.ops.quote_name(source)}")
+        low, high = cursor.fetchone()
+    return low or 0, high or 0
+
+
+def _entry(row) -> CaptchaLogEntry:
+    legacy_id, user_id, captcha_type, ip, access_time, result, message = row
+    return CaptchaLogEntry.build(
+        id=legacy_id,
+        captcha_type=captcha_type,
+        result=result,
+        message=message or "",
+        ip=ip,
+        user_id=user_id,
+        access_time=_aware(access_time),
+    )
+
+
+def _fetch(query: str, params: List[int]) -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def reserve_legacy_ids(source: str = LEGACY_TABLE) -> int:
+    """Move the compact table's id sequence past the legacy ids before anything else is copied.
+
+    The legacy row with the highest id is copied first and the sequence reset to the table's
+    maximum, so rows logged by the running application never take an id a legacy row will need.
+    Returns the number of rows copied (0 once reserved). Raises ``ValueError`` if the compact
+    table already holds rows in the legacy id range that were not copied by this module (the
+    application logged before the first compaction run).
+    """
+    _, high = legacy_id_range(source)
+    if not high or CaptchaLogEntry.objects.filter(id=high).exists():
+        return 0
+    if CaptchaLogEntry.objects.filter(id__lte=high).exists():
+        raise ValueError(
+            f"{CaptchaLogEntry._meta.db_table} already has rows with ids up to {high}; "
+            "run the compaction before new logs are written"
+        )
+    columns = ", ".join(connection.ops.quote_name(name) for name in LEGACY_FIELDS)
+    rows = _fetch(f"SELECT {columns} FROM {connection.ops.quote_name(source)} WHERE id = %s", [high])
+    with transaction.atomic():
+        CaptchaLogEntry.objects.bulk_create([_entry(row) for row in rows])
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), [CaptchaLogEntry]):
+                cursor.execute(statement)
+    return len(rows)
+
+
+def compact_legacy_logs(
+    source: str = LEGACY_TABLE,
+    *,
+    batch_size: int = 5000,
+    after_id: int = 0,
+) -> Iterator[Tuple[int, int]]:
+    """Copy rows with ``id > after_id`` into the compact table, yielding ``(converted, last_id)`` per batch.
+
+    Each batch covers ``batch_size`` consecutive ids and commits on its own; ids already present
+    in the compact table are skipped, so an interrupted or repeated run never duplicates rows.
+    The source table is left untouched. ``bulk_create`` skips the rollup hooks, which is fine
+    because rollups are keyed by type/result names and already count these rows.
+    """
+    reserved = reserve_legacy_ids(source)
+    _, high = legacy_id_range(source)
+    columns = ", ".join(connection.ops.quote_name(name) for name in LEGACY_FIELDS)
+    query = (
+        f"SELECT {columns} FROM {connection.ops.quote_name(source)} "
+        "WHERE id > %s AND id <= %s ORDER BY id"
+    )
+    start = after_id
+    while start < high:
+        end = min(start + batch_size, high)
+        rows = _fetch(query, [start, end])
+        copied = set(
+            CaptchaLogEntry.objects.filter(id__gt=start, id__lte=end).values_list("id", flat=True)
+        )
+        entries: List[CaptchaLogEntry] = [_entry(row) for row in rows if row[0] not in copied]
+        with transaction.atomic():
+            CaptchaLogEntry.objects.bulk_create(entries, batch_size=1000)
+        yield len(entries) + reserved, end
+        reserved = 0
+        start = end
+    if reserved:
+        yield reserved, high
+
+
+def drop_legacy_table(source: str = LEGACY_TABLE) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(source)}")
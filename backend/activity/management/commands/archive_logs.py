@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from activity.archive import archive_logs
+
+
+class Command(BaseCommand):
+    help = "Move captcha logs older than the retention period into gzip NDJSON archives and delete them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CAPTCHA_LOG_RETENTION_DAYS, help="Days to keep.")
+        parser.add_argument("--archive-dir", default=str(settings.CAPTCHA_LOG_ARCHIVE_DIR))
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows moved per transaction.")
+        parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches.")
+        parser.add_argument("--no-archive", action="store_true", help="Delete expired rows without archiving.")
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=0,
+            help="Keep running and repeat every N seconds (for use as a scheduled worker).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            cutoff = timezone.now() - timedelta(days=max(0, options["days"]))
+            moved = 0
+            for count in archive_logs(
+                cutoff,
+                Path(options["archive_dir"]),
+                batch_size=max(1, options["batch_size"]),
+                pause=max(0.0, options["pause"]),
+                delete_only=options["no_archive"],
+            ):
+                moved += count
+            action = "deleted" if options["no_archive"] else "archived"
+            self.stdout.write(f"{action} {moved} captcha logs older than {cutoff:%Y-%m-%d %H:%M}")
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
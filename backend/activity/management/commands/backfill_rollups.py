@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from activity import rollups
+from activity.models import CaptchaLogEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild captcha_log_rollups from captcha_log_entries, one chunk of buckets per transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--granularity",
+            choices=rollups.GRANULARITIES,
+            action="append",
+            help="Granularity to rebuild; may be repeated. Defaults to all.",
+        )
+        parser.add_argument("--chunk-days", type=int, default=7, help="Days of logs aggregated per transaction.")
+        parser.add_argument(
+            "--include-current",
+            action="store_true",
+            help="Also rebuild the bucket in progress (live writes during the rebuild may be lost).",
+        )
+
+    def handle(self, *args, **options):
+        bounds = CaptchaLogEntry.objects.aggregate(first=Min("access_time"))
+        if bounds["first"] is None:
+            self.stdout.write("No captcha logs to aggregate.")
+            return
+
+        chunk = timedelta(days=max(1, options["chunk_days"]))
+        for granularity in options["granularity"] or rollups.GRANULARITIES:
+            current = rollups.bucket_start(timezone.now(), granularity)
+            stop = rollups.next_bucket(current, granularity) if options["include_current"] else current
+            # Buckets before this one may have lost rows to archive_logs; their rollups are kept as is.
+            start = first = rollups.first_complete_bucket(bounds["first"], granularity)
+            buckets = 0
+            while start < stop:
+                end = min(rollups.bucket_start(start + chunk, "day"), stop)
+                buckets += rollups.rebuild(granularity, start, end)
+                start = end
+            self.stdout.write(f"{granularity}: rebuilt {buckets} rollup rows from {timezone.localtime(first):%Y-%m-%d %H:%M}")
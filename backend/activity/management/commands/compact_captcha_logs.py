@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from activity.compaction import LEGACY_TABLE, compact_legacy_logs, drop_legacy_table
+from activity.models import CaptchaLogEntry
+
+
+class Command(BaseCommand):
+    help = "Convert rows of the legacy captcha_logs table into the compact captcha_log_entries table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=LEGACY_TABLE, help="Legacy table to read from.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Source ids converted per transaction.")
+        parser.add_argument("--after-id", type=int, default=0, help="Resume after this source id.")
+        parser.add_argument(
+            "--drop-source",
+            action="store_true",
+            help="Drop the legacy table once every row has been converted.",
+        )
+
+    def handle(self, *args, **options):
+        tables = connection.introspection.table_names()
+        if options["source"] not in tables:
+            raise CommandError(f"table {options['source']} does not exist")
+        if CaptchaLogEntry._meta.db_table not in tables:
+            raise CommandError(f"table {CaptchaLogEntry._meta.db_table} does not exist; run migrate first")
+
+        converted = 0
+        try:
+            for count, last_id in compact_legacy_logs(
+                options["source"],
+                batch_size=max(1, options["batch_size"]),
+                after_id=max(0, options["after_id"]),
+            ):
+                converted += count
+                self.stdout.write(f"converted {converted} rows (last id {last_id})")
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"done: {converted} rows converted from {options['source']}")
+        if options["drop_source"]:
+            drop_legacy_table(options["source"])
+            self.stdout.write(f"dropped {options['source']}")
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import ipaddress
+from typing import Dict, Optional, Tuple
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class CaptchaType(models.Model):
@@ -20,8 +24,13 @@ class CaptchaType(models.Model):
 
 
 class SceneImage(models.Model):
-    category = models.CharField(max_length=50)
+    category = models.CharField(max_length=50, db_index=True)
     file_path = models.CharField(max_length=255)
+    # Filled by `manage.py ingest_scene_images`; rows added by hand keep the defaults.
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, unique=True)
+    thumbnail_path = models.CharField(max_length=255, blank=True)
 
     class Meta:
         db_table = "images"
@@ -32,24 +41,211 @@ class SceneImage(models.Model):
         return f"{self.category}:{self.file_path}"
 
 
+class CaptchaKind(models.IntegerChoices):
+    UNKNOWN = 0, "未知"
+    TEXT = 1, "字符"
+    SLIDER = 2, "滑块"
+    SCENE = 3, "场景"
+    # The verifier reports "expired" as the type when the token no longer exists.
+    EXPIRED = 4, "已过期"
+
+
+class LogResult(models.IntegerChoices):
+    FAILED = 0, "失败"
+    SUCCESS = 1, "成功"
+
+
+class LogReason(models.IntegerChoices):
+    """Verifier messages; anything else is stored as ``OTHER`` with the text in ``detail``."""
+
+    OTHER = 0, "其他"
+    VERIFIED = 1, "验证成功"
+    WRONG_ANSWER = 2, "验证码错误"
+    EXPIRED = 3, "验证码已过期或不存在"
+    INVALID_OFFSET = 4, "滑块位置无效"
+    TOO_MANY_ATTEMPTS = 5, "错误次数过多，请刷新验证码"
+
+
+_REASON_CODES = {label: value for value, label in LogReason.choices if value != LogReason.OTHER}
+
+
+def kind_code(name: str) -> int:
+    return CaptchaKind.__members__.get(str(name).upper(), CaptchaKind.UNKNOWN)
+
+
+def kind_name(code: int) -> str:
+    return CaptchaKind(code).name.lower()
+
+
+def result_code(name: str) -> int:
+    return LogResult.SUCCESS if name == "success" else LogResult.FAILED
+
+
+def result_name(code: int) -> str:
+    return LogResult(code).name.lower()
+
+
+def reason_code(message: str) -> Tuple[int, str]:
+    """``(reason, detail)`` for a message; known verifier messages need no detail text."""
+    code = _REASON_CODES.get(message)
+    return (code, "") if code is not None else (LogReason.OTHER, message or "")
+
+
+def reason_message(code: int, detail: str) -> str:
+    return detail if code == LogReason.OTHER else LogReason(code).label
+
+
+def pack_ip(value: Optional[str]) -> Optional[bytes]:
+    """4 or 16 packed bytes; IPv4-mapped IPv6 is stored as IPv4. Unparseable values become ``None``."""
+    if not value:
+        return None
+    try:
+        address = ipaddress.ip_address(str(value).split(",")[0].strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.packed
+
+
+def unpack_ip(raw: Optional[bytes]) -> Optional[str]:
+    return str(ipaddress.ip_address(bytes(raw))) if raw else None
+
+
+class CaptchaLogEntry(models.Model):
+    """One verification event, stored compactly: small-int codes, packed IP, text only for unknown messages.
+
+    Use :meth:`render` (or the ``*_name`` helpers) to turn a ``values()`` row back into the labels
+    the API and archives expose.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    captcha_type = models.PositiveSmallIntegerField(choices=CaptchaKind.choices, default=CaptchaKind.UNKNOWN)
+    ip = models.BinaryField(max_length=16, null=True)
+    # Set when the event happens rather than on insert, since rows may be written in later batches.
+    access_time = models.DateTimeField(default=timezone.now, editable=False)
+    result = models.PositiveSmallIntegerField(choices=LogResult.choices)
+    reason = models.PositiveSmallIntegerField(choices=LogReason.choices, default=LogReason.OTHER)
+    detail = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "captcha_log_entries"
+        verbose_name = "Captcha Log"
+        verbose_name_plural = "Captcha Logs"
+        ordering = ["-access_time"]
+        # Each index ends with the keyset columns used by /api/activity/logs pagination.
+        indexes = [
+            models.Index(fields=["-access_time", "-id"], name="captcha_entry_time_idx"),
+            models.Index(fields=["captcha_type", "-access_time", "-id"], name="captcha_entry_type_time_idx"),
+            models.Index(fields=["result", "-access_time", "-id"], name="captcha_entry_result_time_idx"),
+            models.Index(fields=["ip", "-access_time", "-id"], name="captcha_entry_ip_time_idx"),
+            models.Index(fields=["user", "-access_time", "-id"], name="captcha_entry_user_time_idx"),
+        ]
+
+    @classmethod
+    def build(
+        cls, *, captcha_type: str, result: str, message: str, ip: Optional[str], user_id: Optional[int], **kwargs
+    ) -> "CaptchaLogEntry":
+        reason, detail = reason_code(message)
+        return cls(
+            user_id=user_id,
+            captcha_type=kind_code(captcha_type),
+            ip=pack_ip(ip),
+            result=result_code(result),
+            reason=reason,
+            detail=detail,
+            **kwargs,
+        )
+
+    @staticmethod
+    def render(row: Dict[str, object]) -> Dict[str, object]:
+        """Replace codes in a ``values()`` row with labels; ``reason``/``detail`` become ``message``."""
+        rendered = dict(row)
+        if "captcha_type" in rendered:
+            rendered["captcha_type"] = kind_name(rendered["captcha_type"])
+        if "result" in rendered:
+            rendered["result"] = result_name(rendered["result"])
+        if "ip" in rendered:
+            rendered["ip"] = unpack_ip(rendered["ip"])
+        if "reason" in rendered:
+            rendered["message"] = reason_message(rendered.pop("reason"), rendered.pop("detail", ""))
+        return rendered
+
+    @property
+    def ip_address(self) -> Optional[str]:
+        return unpack_ip(self.ip)
+
+    @property
+    def message(self) -> str:
+        return reason_message(self.reason, self.detail)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{kind_name(self.captcha_type)} - {result_name(self.result)}"
+
+
 class CaptchaLog(models.Model):
+    """The pre-compaction ``captcha_logs`` table, kept unmanaged so migrations never alter or drop it.
+
+    It keeps the model name the table was created under: ``makemigrations`` then only marks it
+    unmanaged and creates ``captcha_log_entries`` for :class:`CaptchaLogEntry`, instead of renaming
+    and retyping the legacy table in place. ``compact_captcha_logs`` copies its rows over.
+    """
+
     RESULT_CHOICES = [
         ("success", "成功"),
         ("failed", "失败"),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    # DO_NOTHING: deleting a user must not touch a table that --drop-source may already have removed.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.DO_NOTHING, related_name="+"
+    )
     captcha_type = models.CharField(max_length=50)
     ip = models.GenericIPAddressField(null=True, unpack_ipv4=True)
-    access_time = models.DateTimeField(auto_now_add=True)
+    access_time = models.DateTimeField(default=timezone.now, editable=False)
     result = models.CharField(max_length=20, choices=RESULT_CHOICES)
     message = models.TextField(blank=True)
 
     class Meta:
+        managed = False
         db_table = "captcha_logs"
-        verbose_name = "Captcha Log"
-        verbose_name_plural = "Captcha Logs"
-        ordering = ["-access_time"]
+        verbose_name = "Legacy Captcha Log"
+        verbose_name_plural = "Legacy Captcha Logs"
 
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.captcha_type} - {self.result}"
+
+
+ROLLUP_RESULT_CHOICES = [
+    ("success", "成功"),
+    ("failed", "失败"),
+]
+
+
+class CaptchaLogRollup(models.Model):
+    """Pre-aggregated ``CaptchaLogEntry`` counts per time bucket, captcha type and result (stored as names)."""
+
+    GRANULARITY_CHOICES = [
+        ("hour", "小时"),
+        ("day", "天"),
+    ]
+
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    captcha_type = models.CharField(max_length=50)
+    result = models.CharField(max_length=20, choices=ROLLUP_RESULT_CHOICES)
+    total = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "captcha_log_rollups"
+        verbose_name = "Captcha Log Rollup"
+        verbose_name_plural = "Captcha Log Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket_start", "captcha_type", "result"],
+                name="captcha_log_rollup_bucket_unique",
+            )
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.granularity}:{self.bucket_start:%Y-%m-%d %H:00} {self.captcha_type} {self.result}"
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import CaptchaLogEntry, CaptchaLogRollup, kind_name, result_name
+
+GRANULARITIES = ("hour", "day")
+_TRUNC = {"hour": TruncHour, "day": TruncDay}
+
+RollupKey = Tuple[str, datetime, str, str]
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Truncate ``moment`` to its bucket in the current time zone, matching ``TruncHour``/``TruncDay``."""
+    local = timezone.localtime(moment)
+    if granularity == "day":
+        local = local.replace(hour=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def next_bucket(start: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return timezone.make_aware(start.replace(tzinfo=None) + timedelta(days=1))
+    return start + timedelta(hours=1)
+
+
+def first_complete_bucket(first_log: datetime, granularity: str) -> datetime:
+    """The earliest bucket that still holds all of its rows, given the oldest remaining log time.
+
+    ``archive_logs`` removes every row older than its cutoff, so rows before ``first_log`` may
+    have been archived, but none at or after it. Only the bucket containing ``first_log`` can be
+    partial; rebuilding it would replace live-maintained totals with a smaller count.
+    """
+    start = bucket_start(first_log, granularity)
+    return start if start == first_log else next_bucket(start, granularity)
+
+
+def apply_log_entries(entries: Iterable[CaptchaLogEntry]) -> None:
+    """Increment the hourly and daily rollups for freshly written log rows.
+
+    A batch collapses to one counter per (bucket, type, result), so the number of
+    statements depends on the variety in the batch rather than its size.
+    """
+    increments: Counter = Counter()
+    for entry in entries:
+        for granularity in GRANULARITIES:
+            start = bucket_start(entry.access_time, granularity)
+            increments[(granularity, start, kind_name(entry.captcha_type), result_name(entry.result))] += 1
+    for key, amount in increments.items():
+        _increment(key, amount)
+
+
+def _increment(key: RollupKey, amount: int) -> None:
+    granularity, start, captcha_type, result = key
+    lookup = {"granularity": granularity, "bucket_start": start, "captcha_type": captcha_type, "result": result}
+    if CaptchaLogRollup.objects.filter(**lookup).update(total=F("total") + amount):
+        return
+    try:
+        with transaction.atomic():
+            CaptchaLogRollup.objects.create(total=amount, **lookup)
+    except IntegrityError:
+        # Another writer created the bucket first.
+        CaptchaLogRollup.objects.filter(**lookup).update(total=F("total") + amount)
+
+
+def rebuild(granularity: str, start: datetime, end: datetime) -> int:
+    """Recompute rollups for buckets in ``[start, end)`` from the log table; both ends must be bucket-aligned."""
+    rows = (
+        CaptchaLogEntry.objects.filter(access_time__gte=start, access_time__lt=end)
+        .annotate(bucket=_TRUNC[granularity]("access_time"))
+        .order_by()
+        .values("bucket", "captcha_type", "result")
+        .annotate(total=Count("id"))
+    )
+    rollups = [
+        CaptchaLogRollup(
+            granularity=granularity,
+            bucket_start=row["bucket"],
+            captcha_type=kind_name(row["captcha_type"]),
+            result=result_name(row["result"]),
+            total=row["total"],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        CaptchaLogRollup.objects.filter(
+            granularity=granularity, bucket_start__gte=start, bucket_start__lt=end
+        ).delete()
+        CaptchaLogRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def summarize(
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    *,
+    series: bool = False,
+) -> Dict[str, object]:
+    queryset = CaptchaLogRollup.objects.filter(granularity=granularity)
+    if start is not None:
+        queryset = queryset.filter(bucket_start__gte=bucket_start(start, granularity))
+    if end is not None:
+        queryset = queryset.filter(bucket_start__lt=end)
+    queryset = queryset.order_by()
+
+    by_type: Dict[str, int] = {}
+    by_result = {"success": 0, "failed": 0}
+    for row in queryset.values("captcha_type", "result").annotate(count=Sum("total")):
+        by_type[row["captcha_type"]] = by_type.get(row["captcha_type"], 0) + row["count"]
+        by_result[row["result"]] = by_result.get(row["result"], 0) + row["count"]
+
+    data: Dict[str, object] = {
+        "total": sum(by_type.values()),
+        "by_type": [{"captcha_type": name, "total": total} for name, total in by_type.items()],
+        "success": by_result["success"],
+        "failed": by_result["failed"],
+    }
+    if series:
+        points: Dict[datetime, Dict[str, object]] = {}
+        for row in queryset.values("bucket_start", "result").annotate(count=Sum("total")).order_by("bucket_start"):
+            point = points.setdefault(
+                row["bucket_start"], {"bucket": row["bucket_start"], "total": 0, "success": 0, "failed": 0}
+            )
+            point["total"] += row["count"]
+            point[row["result"]] = point.get(row["result"], 0) + row["count"]
+        data["granularity"] = granularity
+        data["series"] = list(points.values())
+    return data
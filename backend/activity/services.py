@@ -1,10 +1,192 @@
 from __future__ import annotations
 
-from typing import Optional
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
 from django.http import HttpRequest
 
-from .models import CaptchaLog
+from captcha_backend.metrics import Counter, Histogram
+
+from . import rollups
+from .models import CaptchaLogEntry
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("sync", "drop", "block")
+
+LOG_EVENT_SECONDS = Histogram("captcha_log_event_seconds", "Time a request spends recording a captcha log event.")
+LOG_WRITE_SECONDS = Histogram("captcha_log_write_seconds", "Time to insert a batch of log rows and update rollups.")
+LOG_ROWS_WRITTEN = Counter("captcha_log_rows_written_total", "Captcha log rows written to the database.")
+
+
+def persist_log_entries(entries: List[CaptchaLogEntry], *, batch_size: Optional[int] = None) -> None:
+    """Insert log rows and fold them into the statistics rollups in one transaction."""
+    with LOG_WRITE_SECONDS.time(), transaction.atomic():
+        CaptchaLogEntry.objects.bulk_create(entries, batch_size=batch_size)
+        rollups.apply_log_entries(entries)
+    LOG_ROWS_WRITTEN.inc(len(entries))
+
+
+class CaptchaLogWriter:
+    """Buffers log rows in a bounded queue and writes them with ``bulk_create`` from a daemon thread.
+
+    A batch is flushed once ``batch_size`` rows are pending or ``flush_interval`` seconds have
+    passed since the first pending row. When the queue is full the ``overflow`` policy decides:
+    ``sync`` writes the row in the caller, ``drop`` discards it and ``block`` waits up to
+    ``flush_interval`` for space before discarding.
+    """
+
+    def __init__(self, *, batch_size: int, flush_interval: float, max_queue: int, overflow: str = "sync") -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow if overflow in OVERFLOW_POLICIES else "sync"
+        self._queue: "queue.Queue[CaptchaLogEntry]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.counters: Dict[str, int] = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0, "sync": 0, "batches": 0}
+
+    def submit(self, entry: CaptchaLogEntry) -> None:
+        self.ensure_running()
+        try:
+            if self.overflow == "block":
+                self._queue.put(entry, timeout=self.flush_interval)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.overflow == "sync":
+                self._write([entry])
+                self.counters["sync"] += 1
+            else:
+                self.counters["dropped"] += 1
+            return
+        self.counters["enqueued"] += 1
+
+    def offer(self, entry: CaptchaLogEntry) -> bool:
+        """Queue ``entry`` without blocking; returns False when the queue is full."""
+        self.ensure_running()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            return False
+        self.counters["enqueued"] += 1
+        return True
+
+    def ensure_running(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Rows queued before fork() belong to the parent process.
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = pid
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="captcha-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+        close_old_connections()
+
+    def _collect(self) -> List[CaptchaLogEntry]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[CaptchaLogEntry]:
+        batch: List[CaptchaLogEntry] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write(self, batch: List[CaptchaLogEntry]) -> None:
+        with self._write_lock:
+            try:
+                persist_log_entries(batch, batch_size=self.batch_size)
+            except Exception:
+                self.counters["failed"] += len(batch)
+                logger.exception("Failed to write %d captcha log rows", len(batch))
+                close_old_connections()
+                return
+        self.counters["flushed"] += len(batch)
+        self.counters["batches"] += 1
+
+    def flush(self) -> int:
+        """Synchronously write everything currently queued."""
+        batch = self._drain()
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+        return len(batch)
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        self._stopped.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "queued": self._queue.qsize(), "capacity": self._queue.maxsize}
+
+
+_writer: Optional[CaptchaLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> Optional[CaptchaLogWriter]:
+    global _writer
+    if not settings.CAPTCHA_LOG_ASYNC:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CaptchaLogWriter(
+                    batch_size=settings.CAPTCHA_LOG_BATCH_SIZE,
+                    flush_interval=settings.CAPTCHA_LOG_FLUSH_INTERVAL_MS / 1000,
+                    max_queue=settings.CAPTCHA_LOG_QUEUE_SIZE,
+                    overflow=settings.CAPTCHA_LOG_OVERFLOW,
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def _build_entry(
+    request: HttpRequest,
+    captcha_type: str,
+    result: str,
+    message: str,
+    user_id: Optional[int],
+) -> CaptchaLogEntry:
+    ip = request.META.get("HTTP_X_FORWARDED_FOR") or request.META.get("REMOTE_ADDR")
+    return CaptchaLogEntry.build(captcha_type=captcha_type, result=result, message=message, ip=ip, user_id=user_id)
 
 
 def log_captcha_event(
@@ -15,11 +197,31 @@ def log_captcha_event(
     message: str = "",
     user_id: Optional[int] = None,
 ) -> None:
-    ip = request.META.get("HTTP_X_FORWARDED_FOR") or request.META.get("REMOTE_ADDR")
-    CaptchaLog.objects.create(
-        user_id=user_id,
-        captcha_type=captcha_type,
-        ip=ip,
-        result=result,
-        message=message,
-    )
+    started = time.perf_counter()
+    entry = _build_entry(request, captcha_type, result, message, user_id)
+    writer = get_log_writer()
+    if writer is None:
+        persist_log_entries([entry])
+    else:
+        writer.submit(entry)
+    LOG_EVENT_SECONDS.observe(time.perf_counter() - started, mode="inline" if writer is None else "queued")
+
+
+async def alog_captcha_event(
+    *,
+    request: HttpRequest,
+    captcha_type: str,
+    result: str,
+    message: str = "",
+    user_id: Optional[int] = None,
+) -> None:
+    started = time.perf_counter()
+    entry = _build_entry(request, captcha_type, result, message, user_id)
+    writer = get_log_writer()
+    if writer is None:
+        # Inline writes may block, so run them off the event loop.
+        await sync_to_async(persist_log_entries)([entry])
+    elif not writer.offer(entry):
+        # So may the overflow policies.
+        await sync_to_async(writer.submit)(entry)
+    LOG_EVENT_SECONDS.observe(time.perf_counter() - started, mode="inline" if writer is None else "queued")
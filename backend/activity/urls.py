@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path("logs", views.logs, name="logs"),
     path("stats", views.stats, name="stats"),
+    path("log-writer", views.log_writer, name="log_writer"),
 ]
@@ -1,16 +1,122 @@
 from __future__ import annotations
 
-from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Count
-from django.http import JsonResponse
+import csv
+import itertools
+from datetime import datetime, time
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
 
-from .models import CaptchaLog
+from . import rollups
+from .models import CaptchaKind, CaptchaLogEntry, LogResult, kind_code, pack_ip
+from .services import get_log_writer
+
+LOG_PAGE_SIZE = 200
+LOG_PAGE_SIZE_MAX = 1000
+LOG_EXPORT_CHUNK_SIZE = 2000
+LOG_FIELDS = ("id", "captcha_type", "result", "ip", "access_time", "user__username", "reason", "detail")
+LOG_EXPORT_FIELDS = ("id", "captcha_type", "result", "ip", "access_time", "user__username", "message")
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
 
 def _admin_required(view_func):
-    return user_passes_test(lambda user: user.is_staff, login_url=None, raise_exception=True)(view_func)
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_staff:
+            raise PermissionDenied
+        return view_func(request, *args, **kwargs)
+
+    return wrapped
+
+
+def _encode_cursor(access_time: datetime, log_id: int) -> str:
+    return urlsafe_base64_encode(f"{access_time.isoformat()}|{log_id}".encode("utf-8"))
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw_time, raw_id = urlsafe_base64_decode(cursor).decode("utf-8").split("|", 1)
+        moment = parse_datetime(raw_time)
+        log_id = int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(cursor)
+    if moment is None:
+        raise ValueError(cursor)
+    return moment, log_id
+
+
+def _filtered_logs(params) -> QuerySet:
+    queryset = CaptchaLogEntry.objects.all()
+    if params.get("type"):
+        code = kind_code(params["type"])
+        if code == CaptchaKind.UNKNOWN and params["type"] != "unknown":
+            return queryset.none()
+        queryset = queryset.filter(captcha_type=code)
+    if params.get("result"):
+        if params["result"] not in ("success", "failed"):
+            return queryset.none()
+        queryset = queryset.filter(result=LogResult[params["result"].upper()])
+    if params.get("ip"):
+        packed = pack_ip(params["ip"])
+        if packed is None:
+            raise ValueError(params["ip"])
+        queryset = queryset.filter(ip=packed)
+    if params.get("user"):
+        queryset = queryset.filter(user__username=params["user"])
+    start = _parse_time(params.get("from"))
+    end = _parse_time(params.get("to"))
+    if start is not None:
+        queryset = queryset.filter(access_time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(access_time__lt=end)
+    return queryset.order_by("-access_time", "-id")
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _export_logs(queryset: QuerySet, export_format: str) -> StreamingHttpResponse:
+    rows = (
+        CaptchaLogEntry.render(row) for row in queryset.values(*LOG_FIELDS).iterator(chunk_size=LOG_EXPORT_CHUNK_SIZE)
+    )
+    if export_format == "csv":
+        writer = csv.writer(_Echo())
+        lines = itertools.chain(
+            [writer.writerow(LOG_EXPORT_FIELDS)],
+            (writer.writerow([row[name] for name in LOG_EXPORT_FIELDS]) for row in rows),
+        )
+        response = StreamingHttpResponse(lines, content_type="text/csv; charset=utf-8")
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        lines = (encoder.encode({name: row[name] for name in LOG_EXPORT_FIELDS}) + "\n" for row in rows)
+        response = StreamingHttpResponse(lines, content_type="application/x-ndjson; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="captcha_logs.{export_format}"'
+    return response
 
 
 @csrf_exempt
@@ -18,12 +124,28 @@ def _admin_required(view_func):
 @_admin_required
 @login_required
 def logs(request):
-    queryset = (
-        CaptchaLog.objects.select_related("user")
-        .values("id", "captcha_type", "result", "ip", "access_time", "user__username", "message")
-        .order_by("-access_time")[:200]
-    )
-    return JsonResponse({"success": True, "data": list(queryset)})
+    try:
+        queryset = _filtered_logs(request.GET)
+        cursor = request.GET.get("cursor")
+        if cursor:
+            cursor_time, cursor_id = _decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(access_time__lt=cursor_time) | Q(access_time=cursor_time, id__lt=cursor_id)
+            )
+        limit = min(max(int(request.GET.get("limit", LOG_PAGE_SIZE)), 1), LOG_PAGE_SIZE_MAX)
+    except (ValueError, ValidationError):
+        return JsonResponse({"success": False, "message": "查询参数无效"}, status=400)
+
+    export_format = request.GET.get("format", "json")
+    if export_format in ("ndjson", "csv"):
+        return _export_logs(queryset, export_format)
+
+    page = [CaptchaLogEntry.render(row) for row in queryset.values(*LOG_FIELDS)[: limit + 1]]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = _encode_cursor(page[-1]["access_time"], page[-1]["id"])
+    return JsonResponse({"success": True, "data": page, "next_cursor": next_cursor})
 
 
 @csrf_exempt
@@ -31,20 +153,23 @@ def logs(request):
 @_admin_required
 @login_required
 def stats(request):
-    total = CaptchaLog.objects.count()
-    by_type = list(CaptchaLog.objects.values("captcha_type").annotate(total=Count("id")))
-    success_ratio = (
-        CaptchaLog.objects.filter(result="success").count(),
-        CaptchaLog.objects.filter(result="failed").count(),
-    )
-    return JsonResponse(
-        {
-            "success": True,
-            "data": {
-                "total": total,
-                "by_type": by_type,
-                "success": success_ratio[0],
-                "failed": success_ratio[1],
-            },
-        }
-    )
+    granularity = request.GET.get("granularity")
+    if granularity is not None and granularity not in rollups.GRANULARITIES:
+        return JsonResponse({"success": False, "message": "granularity 仅支持 hour 或 day"}, status=400)
+    try:
+        start = _parse_time(request.GET.get("from"))
+        end = _parse_time(request.GET.get("to"))
+    except ValueError:
+        return JsonResponse({"success": False, "message": "时间格式无效"}, status=400)
+
+    data = rollups.summarize(granularity or "day", start, end, series=granularity is not None)
+    return JsonResponse({"success": True, "data": data})
+
+
+@csrf_exempt
+@require_GET
+@_admin_required
+@login_required
+def log_writer(request):
+    writer = get_log_writer()
+    return JsonResponse({"success": True, "enabled": writer is not None, "data": writer.stats() if writer else {}})
@@ -5,3 +5,6 @@ class CaptchaApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "captcha_api"
     verbose_name = "Captcha API"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,100 @@
+"""Slider background tiles, loaded or rendered once per process and varied cheaply per challenge.
+
+A library holds a handful of source tiles somewhat larger than the slider image, each in a few
+hue-shifted copies. A challenge only picks a tile, crops it at a random offset and maybe flips
+it; the gap position carries the entropy. Tiles come from an uploaded image file or directory
+(``CaptchaType.image_path``) or, without one, are synthesised with the configured noise engine.
+Like ``rendering``, this module must not import Django.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from . import noise
+
+try:  # pragma: no cover - optional dependency during tests
+    from PIL import Image, ImageDraw, ImageOps
+except Exception:  # pragma: no cover
+    Image = ImageDraw = ImageOps = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+SLIDER_SIZE = (240, 120)
+TILE_SIZE = (320, 160)
+SYNTHESIZED_TILES = 8
+MAX_SOURCE_TILES = 32
+HUE_SHIFTS = (0, 64, 128, 192)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif")
+
+
+def synthesize(width: int, height: int, engine: str = "auto"):
+    """Draw a fresh random background (the per-challenge path before the tile library)."""
+    if noise.resolve_engine(engine) == "numpy":
+        return noise.slider_background(width, height)
+    background = Image.new("RGB", (width, height), (240, 240, 240))
+    draw_blobs(ImageDraw.Draw(background), width, height, count=80 * width * height // (240 * 120))
+    return background
+
+
+def draw_blobs(draw, width: int, height: int, count: int = 80) -> None:
+    for _ in range(count):
+        x = random.randint(0, width)
+        y = random.randint(0, height)
+        radius = random.randint(10, 20)
+        color = tuple(random.randint(120, 200) for _ in range(3))
+        draw.ellipse((x, y, x + radius, y + radius), fill=color, outline=None)
+
+
+def shift_hue(image, shift: int):
+    if not shift:
+        return image
+    hue, saturation, value = image.convert("HSV").split()
+    hue = hue.point(lambda level: (level + shift) % 256)
+    return Image.merge("HSV", (hue, saturation, value)).convert("RGB")
+
+
+def _source_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        return [os.path.join(path, name) for name in names[:MAX_SOURCE_TILES]]
+    return [path] if os.path.isfile(path) else []
+
+
+def load_tiles(path: Optional[str]) -> List[object]:
+    """Uploaded images fitted to ``TILE_SIZE``; unreadable files are skipped."""
+    tiles = []
+    for file_path in _source_files(path) if path else []:
+        try:
+            with Image.open(file_path) as image:
+                tiles.append(ImageOps.fit(image.convert("RGB"), TILE_SIZE))
+        except (OSError, ValueError):
+            logger.warning("Skipping unreadable slider background %s", file_path)
+    return tiles
+
+
+class BackgroundLibrary:
+    def __init__(self, tiles: List[object]) -> None:
+        self.tiles = [shift_hue(tile, shift) for tile in tiles for shift in HUE_SHIFTS]
+
+    def background(self, size: Tuple[int, int] = SLIDER_SIZE):
+        """A new image: random tile, random crop offset, optional horizontal flip."""
+        tile = random.choice(self.tiles)
+        left = random.randint(0, tile.width - size[0])
+        top = random.randint(0, tile.height - size[1])
+        image = tile.crop((left, top, left + size[0], top + size[1]))
+        if random.random() < 0.5:
+            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        return image
+
+
+@lru_cache(maxsize=16)
+def get_library(path: Optional[str] = None, engine: str = "auto") -> BackgroundLibrary:
+    tiles = load_tiles(path)
+    if not tiles:
+        tiles = [synthesize(*TILE_SIZE, engine=engine) for _ in range(SYNTHESIZED_TILES)]
+    return BackgroundLibrary(tiles)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import random
+import string
+import time
+from typing import Dict, List
+
+from . import noise
+from .backgrounds import SLIDER_SIZE, get_library, synthesize
+from .glyphs import DEFAULT_FONT_SIZE, GlyphAtlas, get_atlas, load_font
+from .rendering import Image, ImageDraw, draw_slider, draw_text, encode_image, normalize_encoding
+
+ENCODING_PROFILES: Dict[str, Dict[str, object]] = {
+    "png": {"format": "png"},
+    "png-fast": {"format": "png", "compress_level": 1},
+    "png-max": {"format": "png", "compress_level": 9},
+    "png8-64": {"format": "png8", "colors": 64},
+    "png8-16": {"format": "png8", "colors": 16},
+    "webp-q80": {"format": "webp", "quality": 80},
+    "webp-q50": {"format": "webp", "quality": 50},
+    "webp-lossless": {"format": "webp", "lossless": True},
+    "jpeg-q70": {"format": "jpeg", "quality": 70},
+}
+
+
+def benchmark_encoding(samples: int = 50, engine: str = "pil") -> List[Dict[str, object]]:
+    """Encode the same rendered challenges with every profile and report size and CPU cost.
+
+    Challenges are drawn with the noise ``engine`` production is configured for, since the
+    noise texture drives compressed size. Slider rows count background plus piece bytes; the
+    piece keeps its alpha channel, so JPEG falls back to PNG for it exactly as in production.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for encoding benchmarks")
+    engine = noise.resolve_engine(engine)
+    characters = string.ascii_uppercase + string.digits
+    texts = [draw_text("".join(random.choice(characters) for _ in range(5)), engine=engine) for _ in range(samples)]
+    sliders = [draw_slider(engine=engine)[:2] for _ in range(samples)]
+
+    results = []
+    for name, profile in ENCODING_PROFILES.items():
+        encoding = normalize_encoding(profile)
+        started = time.perf_counter()
+        text_bytes = sum(len(encode_image(image, encoding).content) for image in texts)
+        text_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        slider_bytes = sum(
+            len(encode_image(background, encoding).content) + len(encode_image(piece, encoding, opaque=False).content)
+            for background, piece in sliders
+        )
+        slider_seconds = time.perf_counter() - started
+
+        results.append(
+            {
+                "profile": name,
+                "options": profile,
+                "engine": engine,
+                "text_bytes": round(text_bytes / samples),
+                "text_encode_ms": round(text_seconds * 1000 / samples, 3),
+                "slider_bytes": round(slider_bytes / samples),
+                "slider_encode_ms": round(slider_seconds * 1000 / samples, 3),
+            }
+        )
+    return results
+
+
+def _draw_text_uncached(text: str, engine: str):
+    """The same drawing without caches: the font is loaded and every glyph rasterised and rotated per call."""
+    atlas = GlyphAtlas(load_font.__wrapped__(None, DEFAULT_FONT_SIZE))
+    return draw_text(text, engine=engine, atlas=atlas)
+
+
+def benchmark_text_rendering(samples: int = 200, engine: str = "pil") -> List[Dict[str, object]]:
+    """Renders per second of the uncached text path versus the glyph atlas (drawing only, no encoding).
+
+    Both paths use the same font, size and noise ``engine``, so only the caching differs.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for rendering benchmarks")
+    engine = noise.resolve_engine(engine)
+    characters = string.ascii_uppercase + string.digits
+    texts = ["".join(random.choice(characters) for _ in range(5)) for _ in range(samples)]
+    get_atlas().warm(characters)
+
+    results = []
+    for name, draw in (
+        ("uncached", lambda text: _draw_text_uncached(text, engine)),
+        ("glyph-atlas", lambda text: draw_text(text, engine=engine)),
+    ):
+        started = time.perf_counter()
+        for text in texts:
+            draw(text)
+        seconds = time.perf_counter() - started
+        results.append(
+            {
+                "path": name,
+                "engine": engine,
+                "render_ms": round(seconds * 1000 / samples, 3),
+                "renders_per_second": round(samples / seconds, 1),
+            }
+        )
+    return results
+
+
+def benchmark_noise(samples: int = 200) -> List[Dict[str, object]]:
+    """Drawing time per text challenge and per synthesised slider background, Pillow versus NumPy."""
+    if Image is None:
+        raise RuntimeError("Pillow is required for rendering benchmarks")
+    engines = ["pil"] + (["numpy"] if noise.available() else [])
+    get_atlas().warm(string.ascii_uppercase + string.digits)
+
+    results = []
+    for engine in engines:
+        started = time.perf_counter()
+        for _ in range(samples):
+            draw_text("AB3XZ", engine=engine)
+        text_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(samples):
+            synthesize(*SLIDER_SIZE, engine=engine)
+        slider_seconds = time.perf_counter() - started
+
+        results.append(
+            {
+                "engine": engine,
+                "text_ms": round(text_seconds * 1000 / samples, 3),
+                "slider_ms": round(slider_seconds * 1000 / samples, 3),
+            }
+        )
+    return results
+
+
+def benchmark_slider_backgrounds(samples: int = 200, engine: str = "pil") -> List[Dict[str, object]]:
+    """Slider challenge cost (background, gap and encode) when synthesising versus cropping a tile.
+
+    Both paths use the same noise ``engine``, which also synthesises the tiles when no library is configured.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for rendering benchmarks")
+    engine = noise.resolve_engine(engine)
+    get_library(None, engine)
+
+    def synthesized():
+        background = synthesize(*SLIDER_SIZE, engine=engine)
+        ImageDraw.Draw(background).rectangle((100, 40, 140, 80), fill=(255, 255, 255))
+        return background
+
+    results = []
+    for path, render in (("synthesized", synthesized), ("tile library", lambda: draw_slider(engine=engine)[0])):
+        started = time.perf_counter()
+        for _ in range(samples):
+            encode_image(render())
+        seconds = time.perf_counter() - started
+        results.append({"path": path, "engine": engine, "render_ms": round(seconds * 1000 / samples, 3)})
+    return results
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from activity.models import CaptchaType
+
+from .token_store import get_token_store
+
+CATALOG_VERSION_KEY = "captcha-catalog:version"
+# The version lives in the token store, which every worker shares; re-seeded if it ever expires.
+CATALOG_VERSION_TTL = 30 * 24 * 3600
+CATALOG_ROWS_PREFIX = "captcha-catalog:rows"
+CATALOG_FIELDS = ("id", "type_name", "description", "config_json", "image_path")
+
+DEFAULT_CAPTCHA_TYPE: Dict[str, object] = {
+    "type_name": "text",
+    "description": "默认字符验证码",
+    "config_json": {"length": 5},
+    "image_path": "",
+}
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    loaded_at: float
+    body: bytes
+    etag: str
+    types: Dict[str, Dict[str, object]]
+
+
+class CaptchaTypeCatalog:
+    """Read-only view of ``CaptchaType`` rows, kept in sync across processes by a shared version.
+
+    Each process keeps the last snapshot and re-checks the version in the token store at most
+    every ``local_ttl`` seconds; writers bump it with :meth:`invalidate`. A snapshot older than
+    ``max_age`` seconds is reloaded from the database regardless, as a safety net. Reads never
+    write to the database.
+    """
+
+    def __init__(self, local_ttl: float = 1.0, max_age: float = 60.0) -> None:
+        self.local_ttl = local_ttl
+        self.max_age = max_age
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_version() -> bytes:
+        # Seeded from the clock so an expired entry never reuses a version a process already holds.
+        return str(time.time_ns() // 1000).encode("ascii")
+
+    def _shared_version(self) -> int:
+        store = get_token_store()
+        version = store.get(CATALOG_VERSION_KEY)
+        if version is None:
+            store.add(CATALOG_VERSION_KEY, self._new_version(), CATALOG_VERSION_TTL)
+            version = store.get(CATALOG_VERSION_KEY) or b"0"
+        return int(version)
+
+    def snapshot(self) -> CatalogSnapshot:
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.local_ttl:
+            return snapshot
+        with self._lock:
+            version = self._shared_version()
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._load(version)
+            elif now - snapshot.loaded_at > self.max_age:
+                snapshot = self._snapshot = self._load(version, refresh=True)
+            self._checked_at = time.monotonic()
+        return snapshot
+
+    def _load(self, version: int, *, refresh: bool = False) -> CatalogSnapshot:
+        """Build a snapshot; ``refresh`` skips the cached rows, which may be as stale as the snapshot."""
+        rows_key = f"{CATALOG_ROWS_PREFIX}:{version}"
+        rows: Optional[List[Dict[str, object]]] = None if refresh else cache.get(rows_key)
+        if rows is None:
+            rows = list(CaptchaType.objects.order_by("id").values(*CATALOG_FIELDS))
+            if not rows:
+                rows = [{"id": None, **DEFAULT_CAPTCHA_TYPE}]
+            cache.set(rows_key, rows, timeout=settings.CAPTCHA_CATALOG_SHARED_TTL)
+        body = json.dumps({"success": True, "data": rows}, cls=DjangoJSONEncoder).encode("utf-8")
+        return CatalogSnapshot(
+            version=version,
+            loaded_at=time.monotonic(),
+            body=body,
+            etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+            types={row["type_name"]: row for row in rows},
+        )
+
+    async def asnapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.local_ttl:
+            return snapshot
+        return await sync_to_async(self.snapshot)()
+
+    @staticmethod
+    def _config(snapshot: CatalogSnapshot, type_name: str) -> Dict[str, object]:
+        """The type's ``config_json``; a non-empty ``image_path`` column is included as ``image_path``."""
+        row = snapshot.types.get(type_name)
+        config = row["config_json"] if row else None
+        config = config if isinstance(config, dict) else {}
+        if row and row.get("image_path") and "image_path" not in config:
+            config = {**config, "image_path": row["image_path"]}
+        return config
+
+    def get_config(self, type_name: str) -> Dict[str, object]:
+        return self._config(self.snapshot(), type_name)
+
+    async def aget_config(self, type_name: str) -> Dict[str, object]:
+        return self._config(await self.asnapshot(), type_name)
+
+    def invalidate(self) -> None:
+        get_token_store().set_many({CATALOG_VERSION_KEY: self._new_version()}, CATALOG_VERSION_TTL)
+        self._snapshot = None
+
+
+_catalog: Optional[CaptchaTypeCatalog] = None
+
+
+def get_catalog() -> CaptchaTypeCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = CaptchaTypeCatalog(
+            local_ttl=settings.CAPTCHA_CATALOG_LOCAL_TTL, max_age=settings.CAPTCHA_CATALOG_MAX_AGE
+        )
+    return _catalog
@@ -0,0 +1,90 @@
+"""Font and glyph sprite caches for text captchas.
+
+Fonts are loaded once per (path, size) and every character is rasterised once per rotation
+step into an ``L`` mask; drawing a captcha then only pastes cached masks in a solid colour.
+Like ``rendering``, this module must not import Django so renderer worker processes can use it.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+try:  # pragma: no cover - optional dependency during tests
+    from PIL import Image, ImageDraw, ImageFont
+except Exception:  # pragma: no cover
+    Image = ImageDraw = ImageFont = None  # type: ignore
+
+DEFAULT_FONT_SIZE = 28
+MAX_ROTATION = 25
+ROTATION_STEP = 5
+ANGLES = tuple(range(-MAX_ROTATION, MAX_ROTATION + 1, ROTATION_STEP))
+
+
+@lru_cache(maxsize=16)
+def load_font(path: Optional[str] = None, size: int = DEFAULT_FONT_SIZE):
+    """Load a TrueType font, falling back to Pillow's default font when the path is unusable."""
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        # Pillow builds without FreeType only ship the fixed-size bitmap font.
+        return ImageFont.load_default()
+
+
+class GlyphAtlas:
+    """Lazily filled cache of pre-rotated glyph masks for one font."""
+
+    def __init__(self, font) -> None:
+        self.font = font
+        self._sprites: Dict[Tuple[str, int], object] = {}
+        self._lock = threading.Lock()
+
+    def _rasterize(self, char: str, angle: int):
+        left, top, right, bottom = self.font.getbbox(char)
+        pad = 2
+        mask = Image.new("L", (max(1, right - left) + pad * 2, max(1, bottom - top) + pad * 2), 0)
+        ImageDraw.Draw(mask).text((pad - left, pad - top), char, font=self.font, fill=255)
+        if angle:
+            mask = mask.rotate(angle, resample=Image.BICUBIC, expand=True)
+            bbox = mask.getbbox()
+            if bbox:
+                mask = mask.crop(bbox)
+        return mask
+
+    def sprite(self, char: str, angle: int):
+        key = (char, angle)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            with self._lock:
+                sprite = self._sprites.get(key)
+                if sprite is None:
+                    sprite = self._sprites[key] = self._rasterize(char, angle)
+        return sprite
+
+    def warm(self, characters: str) -> None:
+        for char in characters:
+            for angle in ANGLES:
+                self.sprite(char, angle)
+
+    def draw(self, image, text: str, *, left: int = 10, jitter: int = 4) -> None:
+        """Paste ``text`` onto ``image`` with per-glyph rotation, position jitter and colour."""
+        width, height = image.size
+        step = max(1, min(28, (width - left * 2) // max(1, len(text))))
+        for index, char in enumerate(text):
+            sprite = self.sprite(char, random.choice(ANGLES))
+            x = max(0, left + index * step + random.randint(-jitter, jitter))
+            y = random.randint(2, max(2, height - sprite.height - 2))
+            color = tuple(random.randint(0, 150) for _ in range(3))
+            image.paste(color, (x, y), sprite)
+
+
+@lru_cache(maxsize=16)
+def get_atlas(font_path: Optional[str] = None, font_size: int = DEFAULT_FONT_SIZE) -> GlyphAtlas:
+    return GlyphAtlas(load_font(font_path or None, font_size))
@@ -0,0 +1,216 @@
+"""In-process load driver that pushes captcha scenarios through Django's WSGI or ASGI handler.
+
+No sockets or external servers are involved, so results isolate the request path itself:
+under WSGI each in-flight request occupies a thread, under ASGI they share one event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Generator, List, Tuple
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+Step = Tuple[str, str, Dict[str, object]]
+Response = Tuple[int, bytes]
+Scenario = Generator[Step, Response, None]
+
+
+def issue_scenario() -> Scenario:
+    yield ("POST", "/api/captcha/request", {"type": "text"})
+
+
+def issue_and_verify_scenario() -> Scenario:
+    _, body = yield ("POST", "/api/captcha/request", {"type": "slider", "image_mode": "url"})
+    challenge = json.loads(body)
+    yield ("POST", "/api/captcha/verify", {"token": challenge["token"], "answer": challenge["data"]["target_offset"]})
+
+
+SCENARIOS: Dict[str, Callable[[], Scenario]] = {
+    "issue": issue_scenario,
+    "issue-verify": issue_and_verify_scenario,
+}
+
+
+@dataclass
+class LoadResult:
+    server: str
+    scenario: str
+    requests: int
+    concurrency: int
+    seconds: float
+    per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    errors: int
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def _summarize(server: str, scenario: str, concurrency: int, seconds: float, latencies: List[float], errors: int):
+    ordered = sorted(latencies) or [0.0]
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+    return LoadResult(
+        server=server,
+        scenario=scenario,
+        requests=len(latencies),
+        concurrency=concurrency,
+        seconds=round(seconds, 3),
+        per_second=round(len(latencies) / seconds, 1) if seconds else 0.0,
+        p50_ms=round(statistics.median(ordered) * 1000, 3),
+        p95_ms=percentile(0.95),
+        p99_ms=percentile(0.99),
+        errors=errors,
+    )
+
+
+def _wsgi_call(app: WSGIHandler, method: str, path: str, body: Dict[str, object]) -> Response:
+    payload = json.dumps(body).encode("utf-8")
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(payload)),
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.input": io.BytesIO(payload),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status: List[int] = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line.split(" ", 1)[0]))
+
+    result = app(environ, start_response)
+    try:
+        content = b"".join(result)
+    finally:
+        result.close()
+    return status[0], content
+
+
+async def _asgi_call(app: ASGIHandler, method: str, path: str, body: Dict[str, object]) -> Response:
+    payload = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    delivered = False
+    finished = asyncio.Event()
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    finished.set()
+    return status, b"".join(chunks)
+
+
+def run_wsgi(scenario: str, requests: int, concurrency: int, warmup: int = 0) -> LoadResult:
+    app = WSGIHandler()
+    factory = SCENARIOS[scenario]
+
+    def iteration() -> Tuple[float, bool]:
+        started = time.perf_counter()
+        flow = factory()
+        ok = True
+        try:
+            step = next(flow)
+            while True:
+                response = _wsgi_call(app, *step)
+                ok = ok and response[0] < 400
+                step = flow.send(response)
+        except StopIteration:
+            pass
+        return time.perf_counter() - started, ok
+
+    for _ in range(warmup):
+        iteration()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda _: iteration(), range(requests)))
+    elapsed = time.perf_counter() - started
+    return _summarize(
+        "wsgi", scenario, concurrency, elapsed, [o[0] for o in outcomes], sum(1 for o in outcomes if not o[1])
+    )
+
+
+def run_asgi(scenario: str, requests: int, concurrency: int, warmup: int = 0) -> LoadResult:
+    app = ASGIHandler()
+    factory = SCENARIOS[scenario]
+
+    async def iteration(gate: asyncio.Semaphore) -> Tuple[float, bool]:
+        async with gate:
+            started = time.perf_counter()
+            flow = factory()
+            ok = True
+            try:
+                step = next(flow)
+                while True:
+                    response = await _asgi_call(app, *step)
+                    ok = ok and response[0] < 400
+                    step = flow.send(response)
+            except StopIteration:
+                pass
+            return time.perf_counter() - started, ok
+
+    async def main() -> Tuple[float, List[Tuple[float, bool]]]:
+        gate = asyncio.Semaphore(concurrency)
+        for _ in range(warmup):
+            await iteration(gate)
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(iteration(gate) for _ in range(requests)))
+        return time.perf_counter() - started, outcomes
+
+    elapsed, outcomes = asyncio.run(main())
+    return _summarize(
+        "asgi", scenario, concurrency, elapsed, [o[0] for o in outcomes], sum(1 for o in outcomes if not o[1])
+    )
+
+
+RUNNERS = {"wsgi": run_wsgi, "asgi": run_asgi}
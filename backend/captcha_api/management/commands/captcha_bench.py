@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from captcha_api.benchmarks import (
+    benchmark_encoding,
+    benchmark_noise,
+    benchmark_slider_backgrounds,
+    benchmark_text_rendering,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark captcha images: bytes and encode time per format, text render throughput, "
+        "noise engines and slider backgrounds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=50, help="Challenges rendered per profile.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        samples = max(1, options["samples"])
+        engine = settings.CAPTCHA_NOISE_ENGINE
+        results = benchmark_encoding(samples=samples, engine=engine)
+        rendering = benchmark_text_rendering(samples=samples * 4, engine=engine)
+        noise = benchmark_noise(samples=samples * 4)
+        sliders = benchmark_slider_backgrounds(samples=samples * 4, engine=engine)
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {"encoding": results, "text_rendering": rendering, "noise": noise, "slider_backgrounds": sliders},
+                    indent=2,
+                )
+            )
+            return
+
+        self.stdout.write(f"{'profile':<16}{'text B':>10}{'text ms':>10}{'slider B':>10}{'slider ms':>11}")
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<16}{row['text_bytes']:>10}{row['text_encode_ms']:>10}"
+                f"{row['slider_bytes']:>10}{row['slider_encode_ms']:>11}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'text path':<16}{'engine':>8}{'ms':>10}{'renders/s':>12}")
+        for row in rendering:
+            self.stdout.write(
+                f"{row['path']:<16}{row['engine']:>8}{row['render_ms']:>10}{row['renders_per_second']:>12}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'noise engine':<16}{'text ms':>10}{'slider ms':>11}")
+        for row in noise:
+            self.stdout.write(f"{row['engine']:<16}{row['text_ms']:>10}{row['slider_ms']:>11}")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'slider path':<16}{'engine':>8}{'ms':>10}")
+        for row in sliders:
+            self.stdout.write(f"{row['path']:<16}{row['engine']:>8}{row['render_ms']:>10}")
@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from captcha_api.loadtest import RUNNERS, SCENARIOS
+from captcha_api.perf import throwaway_environment
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive captcha scenarios through the in-process WSGI and/or ASGI handler and report throughput "
+        "and latency. Runs against a throwaway test database and token store, never the configured ones. "
+        "'both' runs each server in a subprocess so ASGI gets the async views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=["wsgi", "asgi", "both"], default="both")
+        parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="issue-verify")
+        parser.add_argument("--requests", type=int, default=500, help="Scenario iterations to run.")
+        parser.add_argument("--concurrency", type=int, default=32, help="Iterations in flight at once.")
+        parser.add_argument("--warmup", type=int, default=50, help="Untimed iterations run first.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if options["server"] == "both":
+            results = [self._run_child(server, options) for server in ("wsgi", "asgi")]
+        else:
+            with throwaway_environment():
+                result = RUNNERS[options["server"]](
+                    options["scenario"],
+                    max(1, options["requests"]),
+                    max(1, options["concurrency"]),
+                    warmup=max(0, options["warmup"]),
+                ).as_dict()
+            result["async_views"] = settings.CAPTCHA_ASYNC_VIEWS
+            results = [result]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'server':<6}{'views':>7}{'reqs':>7}{'conc':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['server']:<6}{'async' if row['async_views'] else 'sync':>7}{row['requests']:>7}"
+                f"{row['concurrency']:>6}{row['per_second']:>9}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+                f"{row['p99_ms']:>9}{row['errors']:>8}"
+            )
+
+    def _run_child(self, server, options):
+        env = dict(os.environ, CAPTCHA_ASYNC_VIEWS="true" if server == "asgi" else "false")
+        command = [
+            sys.executable,
+            "-m",
+            "django",
+            "captcha_loadtest",
+            "--server",
+            server,
+            "--scenario",
+            options["scenario"],
+            "--requests",
+            str(options["requests"]),
+            "--concurrency",
+            str(options["concurrency"]),
+            "--warmup",
+            str(options["warmup"]),
+            "--json",
+        ]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise CommandError(f"{server} load test failed:\n{completed.stderr}")
+        return json.loads(completed.stdout)[0]
@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from captcha_api.perf import child_load_runs, compare, in_process, run_suite, throwaway_environment
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the captcha performance suite against a throwaway test database and token store seeded to realistic sizes "
+        "and emit JSON results; --compare flags regressions against an earlier run. Load runs for a "
+        "server whose views differ from this process (ASGI needs the async views) run in a subprocess."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log-rows", type=int, default=200_000, help="captcha_logs rows to seed.")
+        parser.add_argument("--scene-images", type=int, default=400, help="Scene images to seed.")
+        parser.add_argument("--iterations", type=int, default=200, help="Timed calls per micro-benchmark.")
+        parser.add_argument("--load-requests", type=int, default=300, help="Load iterations per scenario (0 skips).")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--server", choices=["wsgi", "asgi", "both"], default="wsgi")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument("--compare", help="Earlier JSON report to compare against.")
+        parser.add_argument("--load-only", action="store_true", help="Skip the micro-benchmarks.")
+        parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent.")
+        parser.add_argument(
+            "--fail-on-regression", action="store_true", help="Exit non-zero when any benchmark regressed."
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        servers = ["wsgi", "asgi"] if options["server"] == "both" else [options["server"]]
+        load_requests = max(0, options["load_requests"])
+        local = [server for server in servers if in_process(server)]
+        with throwaway_environment():
+            report = run_suite(
+                log_rows=max(0, options["log_rows"]),
+                scene_images=max(0, options["scene_images"]),
+                iterations=max(1, options["iterations"]),
+                load_requests=load_requests,
+                concurrency=max(1, options["concurrency"]),
+                servers=local,
+                micro=not options["load_only"],
+            )
+
+        for server in servers:
+            if load_requests and server not in local:
+                try:
+                    report["load"] += child_load_runs(
+                        server,
+                        log_rows=max(0, options["log_rows"]),
+                        scene_images=max(0, options["scene_images"]),
+                        requests=load_requests,
+                        concurrency=max(1, options["concurrency"]),
+                    )
+                except RuntimeError as exc:
+                    raise CommandError(str(exc))
+        report["load"].sort(key=lambda row: servers.index(row["server"]))
+
+        if baseline is not None:
+            report["comparison"] = compare(report, baseline, options["threshold"])
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n", encoding="utf-8")
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        regressions = [row for row in report.get("comparison", []) if row["regressed"]]
+        for row in regressions:
+            self.stderr.write(
+                f"REGRESSION {row['name']}: {row['metric']} {row['baseline']} -> {row['current']} ({row['change_pct']:+}%)"
+            )
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed by more than {options['threshold']}%")
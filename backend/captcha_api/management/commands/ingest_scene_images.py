@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from captcha_api.scene_ingest import ingest_scene_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Load scene images from a directory tree (one folder per category): dedupe by content hash, "
+        "write thumbnails in a process pool and insert rows with bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("root", help="Directory whose sub-folders are categories.")
+        parser.add_argument("--thumbnail-dir", default=str(settings.CAPTCHA_SCENE_THUMBNAIL_DIR))
+        parser.add_argument(
+            "--size", type=int, default=settings.CAPTCHA_SCENE_THUMBNAIL_SIZE, help="Thumbnail edge in pixels."
+        )
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Files per batch and insert.")
+
+    def handle(self, *args, **options):
+        root = options["root"]
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory")
+        started = time.perf_counter()
+        stats = None
+        for stats in ingest_scene_images(
+            root,
+            thumbnail_dir=options["thumbnail_dir"],
+            size=max(8, options["size"]),
+            workers=options["workers"],
+            batch_size=max(1, options["batch_size"]),
+        ):
+            self.stdout.write(
+                f"scanned {stats.scanned}  created {stats.created}  duplicates {stats.duplicates}  failed {stats.failed}"
+            )
+        if stats is None:
+            self.stdout.write("no images found")
+            return
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"done in {seconds:.1f}s ({stats.scanned / max(seconds, 1e-9):.0f} files/s); "
+            + ", ".join(f"{category}: {count}" for category, count in sorted(stats.categories.items()))
+        )
@@ -0,0 +1,144 @@
+"""Vectorised backgrounds, noise and distortion for captcha images (optional NumPy engine).
+
+Backgrounds are built as a single-channel ``uint8`` palette-index image: gradient levels, blob
+ids and speckle are written with a few array operations, and the index image is handed to
+Pillow once together with a 256-colour palette. ``rendering`` falls back to drawing shapes with
+Pillow when NumPy is not installed. No Django imports: used inside renderer worker processes.
+"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+# Palette layout: gradient levels, then one entry per blob, then speckle grey levels.
+GRADIENT_LEVELS = 128
+BLOB_BASE = GRADIENT_LEVELS
+MAX_BLOBS = 96
+SPECKLE_BASE = BLOB_BASE + MAX_BLOBS
+SPECKLE_LEVELS = 256 - SPECKLE_BASE
+
+_rng = None
+_rng_pid: Optional[int] = None
+
+
+def available() -> bool:
+    return np is not None
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    """Map a configured engine (``auto``, ``numpy`` or ``pil``) to one that can actually run."""
+    if engine == "pil" or np is None:
+        return "pil"
+    return "numpy"
+
+
+def _generator():
+    # Forked renderer workers would otherwise share one random stream.
+    global _rng, _rng_pid
+    pid = os.getpid()
+    if _rng is None or _rng_pid != pid:
+        _rng = np.random.default_rng()
+        _rng_pid = pid
+    return _rng
+
+
+@lru_cache(maxsize=32)
+def _disc(diameter: int):
+    """Pixel offsets covered by ``ImageDraw.ellipse((0, 0, d, d))``."""
+    ys, xs = np.mgrid[0 : diameter + 1, 0 : diameter + 1]
+    inside = (2 * xs - diameter) ** 2 + (2 * ys - diameter) ** 2 <= diameter**2
+    return ys[inside], xs[inside]
+
+
+def gradient_index(width: int, height: int):
+    """Gradient levels ``0..GRADIENT_LEVELS-1`` along a random direction."""
+    angle = _generator().uniform(0, np.pi)
+    t = (np.arange(width, dtype=np.float32) * np.float32(np.cos(angle)))[None, :] + (
+        np.arange(height, dtype=np.float32) * np.float32(np.sin(angle))
+    )[:, None]
+    t -= t.min()
+    t *= (GRADIENT_LEVELS - 1) / max(float(t.max()), 1.0)
+    return t.astype(np.uint8)
+
+
+def stamp_blobs(index, count: int, diameter: Tuple[int, int]) -> None:
+    """Write ``count`` filled circles (random size and position) as blob ids into ``index``."""
+    rng = _generator()
+    height, width = index.shape
+    count = min(count, MAX_BLOBS)
+    lefts = rng.integers(0, width + 1, size=count)
+    tops = rng.integers(0, height + 1, size=count)
+    sizes = rng.integers(diameter[0], diameter[1] + 1, size=count)
+    ids = np.arange(BLOB_BASE, BLOB_BASE + count, dtype=np.uint8)
+    for size in np.unique(sizes):
+        chosen = sizes == size
+        dy, dx = _disc(int(size))
+        ys = tops[chosen][:, None] + dy[None, :]
+        xs = lefts[chosen][:, None] + dx[None, :]
+        valid = (ys < height) & (xs < width)
+        index[ys[valid], xs[valid]] = np.broadcast_to(ids[chosen][:, None], ys.shape)[valid]
+
+
+def speckle_index(index, density: float) -> None:
+    rng = _generator()
+    count = int(index.size * density)
+    pixels = rng.integers(0, index.size, size=count)
+    index.reshape(-1)[pixels] = rng.integers(SPECKLE_BASE, 256, size=count, dtype=np.uint8)
+
+
+def palette(gradient: Tuple[int, int], blobs: Tuple[int, int], speckle: Tuple[int, int]):
+    """256x3 lookup table matching the index layout; colour ranges are inclusive channel bounds."""
+    rng = _generator()
+    lut = np.empty((256, 3), dtype=np.uint8)
+    start, end = rng.integers(gradient[0], gradient[1] + 1, size=(2, 3))
+    steps = np.linspace(0.0, 1.0, GRADIENT_LEVELS)[:, None]
+    lut[:GRADIENT_LEVELS] = start + (end - start) * steps
+    lut[BLOB_BASE:SPECKLE_BASE] = rng.integers(blobs[0], blobs[1] + 1, size=(MAX_BLOBS, 3))
+    lut[SPECKLE_BASE:] = np.linspace(speckle[0], speckle[1], SPECKLE_LEVELS)[:, None]
+    return lut
+
+
+def wave_warp(pixels, amplitude: float, wavelength: float):
+    """Shift each column vertically along a sine wave with a random phase."""
+    height, width = pixels.shape[:2]
+    phase = _generator().uniform(0, 2 * np.pi)
+    shift = np.rint(amplitude * np.sin(2 * np.pi * np.arange(width) / wavelength + phase)).astype(np.intp)
+    rows = np.clip(np.arange(height)[:, None] + shift[None, :], 0, height - 1)
+    return pixels[rows, np.arange(width)[None, :]]
+
+
+def to_image(index, lut):
+    """Hand the index image to Pillow once; the palette lookup happens in ``convert``."""
+    from PIL import Image
+
+    image = Image.fromarray(index, "L")
+    image.putpalette(lut.tobytes(), "RGB")
+    return image.convert("RGB")
+
+
+def text_background(width: int, height: int):
+    index = gradient_index(width, height)
+    speckle_index(index, 0.03)
+    return to_image(index, palette((215, 255), (0, 0), (150, 230)))
+
+
+def distort_text(image):
+    """Wave-warp a drawn text captcha so glyphs and strike lines bend together."""
+    from PIL import Image
+
+    pixels = wave_warp(np.asarray(image), amplitude=3, wavelength=_generator().uniform(60, 110))
+    return Image.fromarray(pixels, "RGB")
+
+
+def slider_background(width: int, height: int):
+    index = gradient_index(width, height)
+    stamp_blobs(index, 80, (10, 20))
+    speckle_index(index, 0.01)
+    return to_image(index, palette((200, 245), (120, 200), (120, 220)))
@@ -0,0 +1,309 @@
+"""Reproducible performance suite: micro-benchmarks of the captcha hot paths plus load runs.
+
+``run_suite`` expects an isolated database and token store (see ``throwaway_environment``),
+seeds them to realistic table sizes and returns a JSON-serialisable report. ``compare`` diffs two
+reports so regressions can be tracked across commits.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from activity import rollups
+from activity.models import CaptchaLogEntry, SceneImage
+from activity.services import get_log_writer, log_captcha_event
+from activity.views import stats
+from captcha_backend.rate_limit import rate_limit
+
+from . import token_store
+from .loadtest import RUNNERS
+from .services import CACHE_PREFIX, CaptchaService, CaptchaVerifier, unpack_answer
+from .token_store import TimedTokenStore, build_token_store, get_token_store
+
+CAPTCHA_TYPES = ("text", "slider", "scene")
+SCENE_CATEGORIES = ("cat", "dog", "car", "bus", "tree", "boat", "bird", "bike")
+
+
+@contextmanager
+def throwaway_environment() -> Iterator[None]:
+    """Point the process at a fresh test database and a temporary SQLite token store, then drop both.
+
+    The background log writer is stopped (it restarts on the next row) before the test database
+    goes away, so rows it still holds are written there and nothing a benchmark does reaches the
+    configured database or token store.
+    """
+    old_name = connection.settings_dict["NAME"]
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    directory = tempfile.mkdtemp(prefix="captcha-perf-")
+    previous = token_store._store
+    token_store._store = TimedTokenStore(build_token_store(f"sqlite:///{directory}/tokens.sqlite3"))
+    try:
+        yield
+    finally:
+        writer = get_log_writer()
+        if writer is not None:
+            writer.stop()
+        token_store._store = previous
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 5) -> Dict[str, object]:
+    """Time ``func`` per call; the fields mirror pytest-benchmark's stats (milliseconds)."""
+    for _ in range(warmup):
+        func()
+    samples: List[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    mean = statistics.fmean(samples)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "min_ms": round(min(samples) * 1000, 4),
+        "max_ms": round(max(samples) * 1000, 4),
+        "mean_ms": round(mean * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "stddev_ms": round(statistics.pstdev(samples) * 1000, 4),
+        "ops": round(1 / mean, 1) if mean else 0.0,
+    }
+
+
+def seed(log_rows: int, scene_images: int, days: int = 90) -> Dict[str, int]:
+    """Fill the (test) database with logs spread over ``days`` days, their rollups and scene images."""
+    now = timezone.now()
+    span = days * 24 * 3600
+    batch: List[CaptchaLogEntry] = []
+    for index in range(log_rows):
+        batch.append(
+            CaptchaLogEntry.build(
+                captcha_type=random.choice(CAPTCHA_TYPES),
+                result="success" if random.random() < 0.7 else "failed",
+                message="",
+                ip=f"10.{index % 250}.{(index // 250) % 250}.{random.randint(1, 254)}",
+                user_id=None,
+                access_time=now - timedelta(seconds=random.randint(0, span)),
+            )
+        )
+        if len(batch) >= 5000:
+            CaptchaLogEntry.objects.bulk_create(batch)
+            batch = []
+    CaptchaLogEntry.objects.bulk_create(batch)
+
+    rollup_rows = 0
+    for granularity in rollups.GRANULARITIES:
+        start = rollups.bucket_start(now - timedelta(days=days + 1), granularity)
+        end = rollups.next_bucket(rollups.bucket_start(now, granularity), granularity)
+        rollup_rows += rollups.rebuild(granularity, start, end)
+
+    SceneImage.objects.bulk_create(
+        SceneImage(category=SCENE_CATEGORIES[index % len(SCENE_CATEGORIES)], file_path=f"/scenes/{index}.jpg")
+        for index in range(scene_images)
+    )
+    return {"captcha_logs": log_rows, "captcha_log_rollups": rollup_rows, "images": scene_images}
+
+
+def _issued_tokens(count: int) -> List[tuple]:
+    store = get_token_store()
+    tokens = []
+    for _ in range(count):
+        payload = CaptchaService.generate_text_captcha()
+        tokens.append((payload.token, unpack_answer(store.get(f"{CACHE_PREFIX}:{payload.token}"))["answer"]))
+    return tokens
+
+
+def micro_benchmarks(iterations: int) -> List[Dict[str, object]]:
+    factory = RequestFactory()
+    results: List[Dict[str, object]] = []
+
+    # Render paths are measured without the pre-rendered pool, i.e. the worst case a request can hit.
+    with override_settings(CAPTCHA_POOL_ENABLED=False):
+        results.append(measure("generate_text_captcha", CaptchaService.generate_text_captcha, iterations))
+        results.append(measure("generate_slider_captcha", CaptchaService.generate_slider_captcha, iterations))
+        results.append(measure("generate_scene_selection", CaptchaService.generate_scene_selection, iterations))
+
+        tokens = iter(_issued_tokens(iterations + 5))
+        results.append(measure("verify[correct]", lambda: CaptchaVerifier.verify(*next(tokens)), iterations))
+        tokens = iter(_issued_tokens(iterations + 5))
+        results.append(measure("verify[wrong]", lambda: CaptchaVerifier.verify(next(tokens)[0], "?"), iterations))
+
+    limits = {"perf": {"strategy": settings.RATE_LIMIT_STRATEGY, "limit": 10**9, "window": 60}}
+    with override_settings(RATE_LIMITS={**settings.RATE_LIMITS, **limits}):
+        limited = rate_limit("perf")(lambda request: JsonResponse({"success": True}))
+        request = factory.post("/perf", REMOTE_ADDR="10.0.0.1")
+        results.append(measure(f"rate_limit[{settings.RATE_LIMIT_STRATEGY}]", lambda: limited(request), iterations))
+
+    request = factory.post("/api/captcha/verify", REMOTE_ADDR="10.0.0.2")
+
+    def log_event():
+        log_captcha_event(request=request, captcha_type="text", result="failed", message="perf")
+
+    with override_settings(CAPTCHA_LOG_ASYNC=False):
+        results.append(measure("log_captcha_event[inline]", log_event, iterations))
+    with override_settings(CAPTCHA_LOG_ASYNC=True):
+        results.append(measure("log_captcha_event[queued]", log_event, iterations))
+        get_log_writer().flush()
+
+    staff = get_user_model().objects.create_user(username="perf-staff", password="perf-staff", is_staff=True)
+    since = (timezone.now() - timedelta(days=7)).isoformat()
+    for name, params in (
+        ("stats[totals]", {}),
+        ("stats[daily series]", {"granularity": "day"}),
+        ("stats[7d hourly series]", {"granularity": "hour", "from": since}),
+    ):
+        stats_request = factory.get("/api/activity/stats", params)
+        stats_request.user = staff
+        results.append(measure(name, lambda: stats(stats_request), max(10, iterations // 4)))
+    return results
+
+
+def in_process(server: str) -> bool:
+    """Whether this process's URLconf suits ``server``: ASGI is only measured with the async views."""
+    return (server == "asgi") == settings.CAPTCHA_ASYNC_VIEWS
+
+
+def load_runs(requests: int, concurrency: int, servers: List[str]) -> List[Dict[str, object]]:
+    results = []
+    for server in servers:
+        if not in_process(server):
+            raise ValueError(f"{server} load runs need CAPTCHA_ASYNC_VIEWS={'true' if server == 'asgi' else 'false'}")
+        for scenario in ("issue", "issue-verify"):
+            result = RUNNERS[server](scenario, requests, concurrency, warmup=min(20, requests)).as_dict()
+            result["async_views"] = settings.CAPTCHA_ASYNC_VIEWS
+            results.append(result)
+    return results
+
+
+def child_load_runs(
+    server: str, *, log_rows: int, scene_images: int, requests: int, concurrency: int
+) -> List[Dict[str, object]]:
+    """Load runs for ``server`` in a fresh process whose views match it, seeded like this run.
+
+    Must be called once this process has dropped its test database, since the child creates its own.
+    """
+    env = dict(os.environ, CAPTCHA_ASYNC_VIEWS="true" if server == "asgi" else "false")
+    command = [
+        sys.executable,
+        "-m",
+        "django",
+        "captcha_perf",
+        "--load-only",
+        "--server",
+        server,
+        "--log-rows",
+        str(log_rows),
+        "--scene-images",
+        str(scene_images),
+        "--load-requests",
+        str(requests),
+        "--concurrency",
+        str(concurrency),
+    ]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{server} load runs failed:\n{completed.stderr}")
+    return json.loads(completed.stdout)["load"]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_suite(
+    *,
+    log_rows: int,
+    scene_images: int,
+    iterations: int,
+    load_requests: int,
+    concurrency: int,
+    servers: List[str],
+    micro: bool = True,
+) -> Dict[str, object]:
+    """Seed, then run the micro-benchmarks and the load runs for ``servers`` (which must suit this process)."""
+    started = time.perf_counter()
+    seeded = seed(log_rows, scene_images)
+    seed_seconds = time.perf_counter() - started
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "token_store": settings.CAPTCHA_TOKEN_STORE_URL.split(":", 1)[0],
+            "token_mode": settings.CAPTCHA_TOKEN_MODE,
+            "renderer": settings.CAPTCHA_RENDERER,
+            "noise_engine": settings.CAPTCHA_NOISE_ENGINE,
+            "seeded": seeded,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "micro": micro_benchmarks(iterations) if micro else [],
+        "load": load_runs(load_requests, concurrency, servers) if load_requests else [],
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], threshold: float) -> List[Dict[str, object]]:
+    """Per-benchmark change versus ``baseline``; ``regressed`` marks slowdowns beyond ``threshold`` percent."""
+    rows = []
+    previous = {row["name"]: row for row in baseline.get("micro", [])}
+    for row in current.get("micro", []):
+        before = previous.get(row["name"])
+        if before and before["mean_ms"]:
+            change = (row["mean_ms"] - before["mean_ms"]) / before["mean_ms"] * 100
+            rows.append(
+                {
+                    "name": row["name"],
+                    "metric": "mean_ms",
+                    "baseline": before["mean_ms"],
+                    "current": row["mean_ms"],
+                    "change_pct": round(change, 1),
+                    "regressed": change > threshold,
+                }
+            )
+    previous = {(row["server"], row["scenario"]): row for row in baseline.get("load", [])}
+    for row in current.get("load", []):
+        before = previous.get((row["server"], row["scenario"]))
+        if before and before["per_second"]:
+            change = (row["per_second"] - before["per_second"]) / before["per_second"] * 100
+            rows.append(
+                {
+                    "name": f"load[{row['server']}:{row['scenario']}]",
+                    "metric": "per_second",
+                    "baseline": before["per_second"],
+                    "current": row["per_second"],
+                    "change_pct": round(change, 1),
+                    "regressed": -change > threshold,
+                }
+            )
+    return rows
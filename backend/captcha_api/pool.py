@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RATE_WINDOW_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class ChallengeSpec:
+    """Hashable description of a challenge variant that can be pre-rendered."""
+
+    kind: str
+    options: Tuple[Tuple[str, object], ...] = ()
+
+    @classmethod
+    def build(cls, kind: str, **options: object) -> "ChallengeSpec":
+        return cls(kind=kind, options=tuple(sorted(options.items())))
+
+    def option(self, name: str, default: object = None) -> object:
+        return dict(self.options).get(name, default)
+
+
+@dataclass
+class _PoolSlot(Generic[T]):
+    items: Deque[T]
+    hits: int = 0
+    misses: int = 0
+    rendered: int = 0
+    render_seconds: float = 0.0
+    refills: Deque[Tuple[float, int]] = field(default_factory=deque)
+
+    def refill_rate(self, now: float) -> float:
+        while self.refills and now - self.refills[0][0] > RATE_WINDOW_SECONDS:
+            self.refills.popleft()
+        return sum(count for _, count in self.refills) / RATE_WINDOW_SECONDS
+
+
+class ChallengePool(Generic[T]):
+    """Bounded per-spec pool of pre-rendered challenges kept topped up by a daemon thread.
+
+    ``acquire`` never renders; it returns ``None`` when the pool for a spec is empty so
+    callers can fall back to synchronous rendering.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[ChallengeSpec, int], List[T]],
+        *,
+        capacity: int,
+        low_watermark: int,
+        refill_batch: int,
+        max_specs: int,
+        interval: float = 1.0,
+        specs: Iterable[ChallengeSpec] = (),
+    ) -> None:
+        self._factory = factory
+        self.capacity = max(1, capacity)
+        self.low_watermark = min(max(0, low_watermark), self.capacity)
+        self.refill_batch = max(1, refill_batch)
+        self.max_specs = max_specs
+        self.interval = interval
+        self._slots: Dict[ChallengeSpec, _PoolSlot[T]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        for spec in specs:
+            self._slot(spec)
+
+    def _slot(self, spec: ChallengeSpec) -> Optional[_PoolSlot[T]]:
+        slot = self._slots.get(spec)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(spec)
+                if slot is None and len(self._slots) < self.max_specs:
+                    slot = self._slots[spec] = _PoolSlot(items=deque(maxlen=self.capacity))
+        return slot
+
+    def acquire(self, spec: ChallengeSpec) -> Optional[T]:
+        self.ensure_running()
+        slot = self._slot(spec)
+        if slot is None:
+            return None
+        try:
+            item = slot.items.popleft()
+        except IndexError:
+            slot.misses += 1
+            self._wakeup.set()
+            return None
+        slot.hits += 1
+        if len(slot.items) < self.low_watermark:
+            self._wakeup.set()
+        return item
+
+    def ensure_running(self) -> None:
+        # Threads do not survive fork(), so pre-forking servers get a fresh worker per process.
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="captcha-pool-refill", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refill()
+            except Exception:  # pragma: no cover - keep the worker alive
+                logger.exception("Captcha pool refill failed")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def refill(self) -> int:
+        produced = 0
+        for spec, slot in list(self._slots.items()):
+            if len(slot.items) >= self.low_watermark and slot.items:
+                continue
+            while not self._stopped.is_set() and len(slot.items) < self.capacity:
+                count = min(self.refill_batch, self.capacity - len(slot.items))
+                started = time.perf_counter()
+                batch = self._factory(spec, count)
+                elapsed = time.perf_counter() - started
+                slot.items.extend(batch)
+                slot.rendered += len(batch)
+                slot.render_seconds += elapsed
+                slot.refills.append((time.monotonic(), len(batch)))
+                produced += len(batch)
+                if not batch:
+                    break
+        return produced
+
+    def stats(self) -> List[Dict[str, object]]:
+        now = time.monotonic()
+        result = []
+        for spec, slot in list(self._slots.items()):
+            result.append(
+                {
+                    "kind": spec.kind,
+                    "options": dict(spec.options),
+                    "depth": len(slot.items),
+                    "capacity": self.capacity,
+                    "low_watermark": self.low_watermark,
+                    "hits": slot.hits,
+                    "misses": slot.misses,
+                    "rendered": slot.rendered,
+                    "refill_rate": round(slot.refill_rate(now), 3),
+                    "render_ms_avg": round(slot.render_seconds * 1000 / slot.rendered, 3) if slot.rendered else None,
+                }
+            )
+        return result
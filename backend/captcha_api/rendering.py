@@ -0,0 +1,202 @@
+"""Pillow rendering for pre-generated challenges.
+
+This module deliberately avoids importing Django models so it can be loaded inside
+renderer worker processes without configuring the project.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import random
+import string
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from . import noise
+from .backgrounds import SLIDER_SIZE, get_library
+from .glyphs import DEFAULT_FONT_SIZE, GlyphAtlas, get_atlas
+from .pool import ChallengeSpec
+
+try:  # pragma: no cover - optional dependency during tests
+    from PIL import Image, ImageDraw, ImageFilter, features
+except Exception:  # pragma: no cover
+    Image = ImageDraw = ImageFilter = features = None  # type: ignore
+
+
+Encoding = Tuple[Tuple[str, object], ...]
+
+CONTENT_TYPES = {"png": "image/png", "png8": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+_FORMAT_ALIASES = {"jpg": "jpeg", "palette": "png8"}
+
+
+class EncodedImage(NamedTuple):
+    content: bytes
+    content_type: str
+
+    def as_data_uri(self) -> str:
+        encoded = base64.b64encode(self.content).decode("utf-8")
+        return f"data:{self.content_type};base64,{encoded}"
+
+
+@dataclass
+class RenderedChallenge:
+    """A challenge rendered ahead of token assignment: encoded images plus the expected answer."""
+
+    type: str
+    answer: object
+    images: Dict[str, EncodedImage] = field(default_factory=dict)
+    extra: Dict[str, object] = field(default_factory=dict)
+
+    def to_data(self) -> Dict[str, object]:
+        data: Dict[str, object] = {name: image.as_data_uri() for name, image in self.images.items()}
+        data.update(self.extra)
+        return data
+
+
+def normalize_encoding(config: Optional[Mapping[str, object]]) -> Encoding:
+    """Validate a ``config_json`` encoding block into hashable options.
+
+    Supported keys: ``format`` (png, png8, webp, jpeg), ``quality`` (1-100), ``lossless``,
+    ``compress_level`` (0-9), ``colors`` (2-256, png8 only) and ``method`` (0-6, webp only).
+    """
+    if not isinstance(config, Mapping):
+        return ()
+    options: Dict[str, object] = {}
+    fmt = str(config.get("format", "png")).lower()
+    fmt = _FORMAT_ALIASES.get(fmt, fmt)
+    if fmt in CONTENT_TYPES and fmt != "png":
+        options["format"] = fmt
+    limits = {"quality": (1, 100), "compress_level": (0, 9), "colors": (2, 256), "method": (0, 6)}
+    for key, (low, high) in limits.items():
+        if key in config:
+            try:
+                options[key] = min(max(int(config[key]), low), high)
+            except (TypeError, ValueError):
+                continue
+    if "lossless" in config:
+        options["lossless"] = bool(config["lossless"])
+    return tuple(sorted(options.items()))
+
+
+def encode_image(image, encoding: Encoding = (), *, opaque: bool = True) -> EncodedImage:
+    options = dict(encoding)
+    fmt = options.get("format", "png")
+    if fmt == "jpeg" and not opaque:
+        fmt = "png"
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "png"
+
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(
+            buffer,
+            format="WEBP",
+            quality=options.get("quality", 80),
+            lossless=options.get("lossless", False),
+            method=options.get("method", 4),
+        )
+    elif fmt == "jpeg":
+        image.convert("RGB").save(buffer, format="JPEG", quality=options.get("quality", 75), optimize=True)
+    else:
+        if fmt == "png8":
+            image = image.quantize(colors=options.get("colors", 64), method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, format="PNG", compress_level=options.get("compress_level", 6))
+    return EncodedImage(buffer.getvalue(), CONTENT_TYPES[fmt])
+
+
+def render_challenge(spec: ChallengeSpec) -> RenderedChallenge:
+    if spec.kind == "text":
+        length = int(spec.option("length", 5))
+        characters = string.ascii_uppercase + string.digits
+        solution = "".join(random.choice(characters) for _ in range(length))
+        if Image is None:
+            return RenderedChallenge(type="text", answer=solution, extra={"image": solution, "length": length})
+        return RenderedChallenge(
+            type="text",
+            answer=solution,
+            images={
+                "image": encode_image(
+                    draw_text(
+                        solution,
+                        spec.option("font_path"),
+                        spec.option("font_size", DEFAULT_FONT_SIZE),
+                        engine=spec.option("noise", "auto"),
+                    ),
+                    spec.option("encoding", ()),
+                )
+            },
+            extra={"length": length},
+        )
+    if spec.kind == "slider":
+        if Image is None:
+            placeholder = base64.b64encode(b"slider-placeholder").decode("utf-8")
+            return RenderedChallenge(
+                type="slider",
+                answer=30,
+                extra={"background": placeholder, "piece": placeholder, "target_offset": 30},
+            )
+        background, piece, target_offset = draw_slider(
+            engine=spec.option("noise", "auto"), backgrounds=spec.option("backgrounds")
+        )
+        encoding = spec.option("encoding", ())
+        return RenderedChallenge(
+            type="slider",
+            answer=target_offset,
+            images={
+                "background": encode_image(background, spec.option("background_encoding") or encoding),
+                "piece": encode_image(piece, encoding, opaque=False),
+            },
+            extra={"target_offset": target_offset},
+        )
+    raise ValueError(f"Unsupported captcha kind: {spec.kind}")
+
+
+def render_batch(spec: ChallengeSpec, count: int) -> List[RenderedChallenge]:
+    return [render_challenge(spec) for _ in range(count)]
+
+
+def draw_text(
+    text: str,
+    font_path: Optional[str] = None,
+    font_size: int = DEFAULT_FONT_SIZE,
+    *,
+    engine: str = "auto",
+    atlas: Optional[GlyphAtlas] = None,
+):
+    width, height = 160, 60
+    vectorized = noise.resolve_engine(engine) == "numpy"
+    if vectorized:
+        image = noise.text_background(width, height)
+    else:
+        image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+
+    for _ in range(5):
+        start = (random.randint(0, width), random.randint(0, height))
+        end = (random.randint(0, width), random.randint(0, height))
+        color = tuple(random.randint(100, 200) for _ in range(3))
+        draw.line([start, end], fill=color, width=2)
+
+    (atlas or get_atlas(font_path, font_size)).draw(image, text)
+    if vectorized:
+        return noise.distort_text(image)
+    return image.filter(ImageFilter.SMOOTH)
+
+
+def draw_slider(*, engine: str = "auto", backgrounds: Optional[str] = None) -> Tuple[object, object, int]:
+    width, height = SLIDER_SIZE
+    gap_width = 40
+    gap_height = 40
+    offset_x = random.randint(60, width - gap_width - 10)
+    offset_y = random.randint(20, height - gap_height - 20)
+
+    background = get_library(backgrounds, engine).background((width, height))
+    draw = ImageDraw.Draw(background)
+
+    piece = Image.new("RGBA", (gap_width, gap_height))
+    piece.paste(background.crop((offset_x, offset_y, offset_x + gap_width, offset_y + gap_height)))
+
+    draw.rectangle((offset_x, offset_y, offset_x + gap_width, offset_y + gap_height), fill=(255, 255, 255))
+
+    return background, piece, offset_x
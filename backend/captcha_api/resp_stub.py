@@ -0,0 +1,247 @@
+"""In-process stand-in for a Redis server, for exercising ``RedisTokenStore`` without one.
+
+Speaks enough RESP2 for the token store: AUTH, SELECT, PING, GET, SET (PX/EX/NX), GETDEL, DEL,
+INCR and WATCH/MULTI/EXEC transactions, with per-database key spaces and lazy expiry. It is single-node and keeps everything
+in memory; it is not meant to be a Redis replacement beyond that.
+"""
+
+from __future__ import annotations
+
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Entry = Tuple[bytes, Optional[float]]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        # Pipelined replies go out as separate small writes; don't let Nagle hold them back.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = {"db": 0, "authenticated": self.server.stub.password is None, "watched": {}, "queue": None}
+        self.server.stub._register(self.connection)
+        try:
+            while True:
+                command = self._read_command()
+                if command is None:
+                    return
+                self.wfile.write(self.server.stub.dispatch(session, command))
+        except (ConnectionError, OSError):
+            return
+        finally:
+            self.server.stub._unregister(self.connection)
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            raise ConnectionError("inline commands are not supported")
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = self.rfile.readline()
+            length = int(header[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, stub: "RespStub") -> None:
+        self.stub = stub
+        super().__init__(address, _Handler)
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _error(message: str) -> bytes:
+    return f"-{message}\r\n".encode()
+
+
+class RespStub:
+    """Serve on ``127.0.0.1`` (an ephemeral port by default); use as a context manager or call start/stop."""
+
+    def __init__(self, *, port: int = 0, password: Optional[str] = None) -> None:
+        self.password = password
+        self._data: Dict[int, Dict[bytes, Entry]] = {}
+        self._lock = threading.Lock()
+        self._connections: List[object] = []
+        self._server = _Server(("127.0.0.1", port), self)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{self.port}"
+
+    def start(self) -> "RespStub":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="resp-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+
+    def __enter__(self) -> "RespStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _register(self, connection) -> None:
+        with self._lock:
+            self._connections.append(connection)
+
+    def _unregister(self, connection) -> None:
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+    def drop_connections(self) -> None:
+        """Close every client socket, as a server restart would."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+                connection.close()
+            except OSError:
+                pass
+
+    def keys(self, db: int = 0) -> List[bytes]:
+        with self._lock:
+            space = self._data.get(db, {})
+            return sorted(key for key in list(space) if self._live(space, key) is not None)
+
+    @staticmethod
+    def _live(space: Dict[bytes, Entry], key: bytes) -> Optional[bytes]:
+        entry = space.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and time.monotonic() >= expires:
+            del space[key]
+            return None
+        return value
+
+    def dispatch(self, session: Dict[str, object], args: List[bytes]) -> bytes:
+        if not args:
+            return _error("ERR empty command")
+        name = args[0].upper().decode(errors="replace")
+        if name == "AUTH":
+            if self.password is None:
+                return _error("ERR Client sent AUTH, but no password is set")
+            if args[-1].decode(errors="replace") != self.password:
+                return _error("WRONGPASS invalid username-password pair")
+            session["authenticated"] = True
+            return b"+OK\r\n"
+        if not session["authenticated"]:
+            return _error("NOAUTH Authentication required.")
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name == "SELECT":
+            session["db"] = int(args[1])
+            return b"+OK\r\n"
+        if name in ("MULTI", "EXEC", "DISCARD", "WATCH", "UNWATCH"):
+            return self._transaction(session, name, args[1:])
+        if session["queue"] is not None:
+            session["queue"].append(args)
+            return b"+QUEUED\r\n"
+        with self._lock:
+            return self._run(session["db"], args)
+
+    def _run(self, db: int, args: List[bytes]) -> bytes:
+        handler = getattr(self, f"_cmd_{args[0].decode(errors='replace').lower()}", None)
+        if handler is None:
+            return _error(f"ERR unknown command '{args[0].decode(errors='replace').upper()}'")
+        return handler(self._data.setdefault(db, {}), args[1:])
+
+    def _transaction(self, session: Dict[str, object], name: str, args: List[bytes]) -> bytes:
+        # A watched key counts as modified when its entry is no longer the same object; every
+        # write and every expiry replaces or removes the entry tuple.
+        if name == "WATCH":
+            if session["queue"] is not None:
+                return _error("ERR WATCH inside MULTI is not allowed")
+            with self._lock:
+                space = self._data.setdefault(session["db"], {})
+                for key in args:
+                    self._live(space, key)
+                    session["watched"][(session["db"], key)] = space.get(key)
+            return b"+OK\r\n"
+        if name == "UNWATCH":
+            session["watched"] = {}
+            return b"+OK\r\n"
+        if name == "MULTI":
+            if session["queue"] is not None:
+                return _error("ERR MULTI calls can not be nested")
+            session["queue"] = []
+            return b"+OK\r\n"
+        queue, watched = session["queue"], session["watched"]
+        session["queue"], session["watched"] = None, {}
+        if queue is None:
+            return _error(f"ERR {name} without MULTI")
+        if name == "DISCARD":
+            return b"+OK\r\n"
+        with self._lock:
+            for (db, key), entry in watched.items():
+                space = self._data.setdefault(db, {})
+                self._live(space, key)
+                if space.get(key) is not entry:
+                    return b"*-1\r\n"
+            replies = [self._run(session["db"], command) for command in queue]
+        return b"*%d\r\n%s" % (len(replies), b"".join(replies))
+
+    def _cmd_get(self, space, args) -> bytes:
+        return _bulk(self._live(space, args[0]))
+
+    def _cmd_getdel(self, space, args) -> bytes:
+        value = self._live(space, args[0])
+        space.pop(args[0], None)
+        return _bulk(value)
+
+    def _cmd_del(self, space, args) -> bytes:
+        removed = 0
+        for key in args:
+            if self._live(space, key) is not None:
+                removed += 1
+            space.pop(key, None)
+        return b":%d\r\n" % removed
+
+    def _cmd_set(self, space, args) -> bytes:
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires = None
+        if b"PX" in options:
+            expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+        elif b"EX" in options:
+            expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+        if b"NX" in options and self._live(space, key) is not None:
+            return _bulk(None)
+        space[key] = (value, expires)
+        return b"+OK\r\n"
+
+    def _cmd_incr(self, space, args) -> bytes:
+        key = args[0]
+        current = self._live(space, key)
+        try:
+            number = int(current or b"0") + 1
+        except ValueError:
+            return _error("ERR value is not an integer or out of range")
+        # INCR keeps the existing TTL.
+        space[key] = (str(number).encode(), space[key][1] if key in space else None)
+        return b":%d\r\n" % number
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from activity.models import SceneImage
+
+from .token_store import get_token_store
+
+SCENE_INDEX_VERSION_KEY = "captcha-scene-index:version"
+# Kept in the token store like the catalog version, so every worker sees a bump; re-seeded on expiry.
+SCENE_INDEX_VERSION_TTL = 30 * 24 * 3600
+
+
+@dataclass(frozen=True)
+class SceneIndexSnapshot:
+    version: int
+    loaded_at: float
+    ids: array
+    paths: List[str]
+    categories: List[str]
+    category_of: array
+    members: Dict[str, array]
+
+
+@dataclass
+class SceneSample:
+    category: str
+    images: List[Tuple[int, str]]
+    answer: List[int]
+
+
+class SceneImageIndex:
+    """Array-backed category → image index so scene challenges are sampled without touching the DB.
+
+    Rows live in parallel arrays (id, file path, category number) and each category keeps an
+    array of row positions. The snapshot is rebuilt when the version in the token store (shared
+    by every worker) is bumped by a ``SceneImage`` change, or after ``ttl`` seconds as a safety net.
+    """
+
+    def __init__(self, *, ttl: float, check_interval: float) -> None:
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._snapshot: Optional[SceneIndexSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_version() -> bytes:
+        return str(time.time_ns() // 1000).encode("ascii")
+
+    def _shared_version(self) -> int:
+        store = get_token_store()
+        version = store.get(SCENE_INDEX_VERSION_KEY)
+        if version is None:
+            store.add(SCENE_INDEX_VERSION_KEY, self._new_version(), SCENE_INDEX_VERSION_TTL)
+            version = store.get(SCENE_INDEX_VERSION_KEY) or b"0"
+        return int(version)
+
+    def snapshot(self) -> SceneIndexSnapshot:
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        # Only one thread reloads; the others keep serving the previous snapshot meanwhile.
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            version = self._shared_version()
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version or now - snapshot.loaded_at > self.ttl:
+                snapshot = self._snapshot = self._load(version)
+            self._checked_at = time.monotonic()
+            return snapshot
+        finally:
+            self._lock.release()
+
+    def _load(self, version: int) -> SceneIndexSnapshot:
+        ids = array("q")
+        paths: List[str] = []
+        category_of = array("H")
+        categories: List[str] = []
+        category_numbers: Dict[str, int] = {}
+        members: Dict[str, array] = {}
+        # Ingested images carry a pre-sized thumbnail; serve that instead of decoding the original.
+        rows = SceneImage.objects.order_by("id").values_list("id", "category", "file_path", "thumbnail_path")
+        for position, (image_id, category, file_path, thumbnail_path) in enumerate(rows.iterator(chunk_size=5000)):
+            number = category_numbers.get(category)
+            if number is None:
+                number = category_numbers[category] = len(categories)
+                categories.append(category)
+                members[category] = array("I")
+            ids.append(image_id)
+            paths.append(thumbnail_path or file_path)
+            category_of.append(number)
+            members[category].append(position)
+        return SceneIndexSnapshot(
+            version=version,
+            loaded_at=time.monotonic(),
+            ids=ids,
+            paths=paths,
+            categories=categories,
+            category_of=category_of,
+            members=members,
+        )
+
+    def invalidate(self) -> None:
+        get_token_store().set_many({SCENE_INDEX_VERSION_KEY: self._new_version()}, SCENE_INDEX_VERSION_TTL)
+        self._checked_at = 0.0
+
+    def sample(self, size: int, min_targets: int, max_targets: int) -> Optional[SceneSample]:
+        """Pick a target category and mix ``min_targets``..``max_targets`` of its images with distractors.
+
+        Cost is O(size): targets come from ``random.sample`` over the category's positions and
+        distractors are drawn from the whole index, rejecting hits on the target category.
+        """
+        snapshot = self.snapshot()
+        if not snapshot.categories:
+            return None
+        category = random.choice(snapshot.categories)
+        positions = snapshot.members[category]
+        target_number = snapshot.category_of[positions[0]]
+        others = len(snapshot.ids) - len(positions)
+
+        if others == 0:
+            targets = random.sample(positions, min(size, len(positions)))
+            distractors: List[int] = []
+        else:
+            count = random.randint(min(min_targets, max_targets), max_targets)
+            targets = random.sample(positions, min(count, len(positions), size))
+            wanted = min(size - len(targets), others)
+            chosen = set()
+            attempts = 0
+            while len(chosen) < wanted and attempts < wanted * 20:
+                attempts += 1
+                position = random.randrange(len(snapshot.ids))
+                if snapshot.category_of[position] != target_number:
+                    chosen.add(position)
+            distractors = list(chosen)
+
+        picked = targets + distractors
+        random.shuffle(picked)
+        return SceneSample(
+            category=category,
+            images=[(snapshot.ids[position], snapshot.paths[position]) for position in picked],
+            answer=sorted(snapshot.ids[position] for position in targets),
+        )
+
+
+_index: Optional[SceneImageIndex] = None
+
+
+def get_scene_index() -> SceneImageIndex:
+    global _index
+    if _index is None:
+        _index = SceneImageIndex(
+            ttl=settings.CAPTCHA_SCENE_INDEX_TTL,
+            check_interval=settings.CAPTCHA_CATALOG_LOCAL_TTL,
+        )
+    return _index
@@ -0,0 +1,151 @@
+"""Bulk loading of scene images from a directory tree (one folder per category).
+
+Files are streamed in batches: a process pool hashes each file and writes its fixed-size
+thumbnail, then the batch is deduplicated by content hash and inserted with ``bulk_create``.
+Stored paths are relative to ``MEDIA_ROOT`` when the file lives under it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from activity.models import SceneImage
+
+from .rendering import Image
+from .scene_index import get_scene_index
+
+try:  # pragma: no cover - optional dependency during tests
+    from PIL import ImageOps
+except Exception:  # pragma: no cover
+    ImageOps = None  # type: ignore
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif")
+
+
+@dataclass
+class IngestStats:
+    scanned: int = 0
+    created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+
+
+def iter_images(root: str) -> Iterator[Tuple[str, str]]:
+    """Yield ``(category, path)`` for image files under ``root``; the category is the top-level folder."""
+    with os.scandir(root) as categories:
+        for category in sorted(categories, key=lambda entry: entry.name):
+            if not category.is_dir():
+                continue
+            for directory, subdirectories, files in os.walk(category.path):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield category.name, os.path.join(directory, name)
+
+
+def _stored_path(path: str) -> str:
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(path)
+    if os.path.commonpath([media_root, path]) == media_root:
+        return os.path.relpath(path, media_root)
+    return path
+
+
+def process_image(path: str, thumbnail_dir: str, size: int) -> Optional[Dict[str, object]]:
+    """Hash, measure and thumbnail one file (runs in a worker process); ``None`` if it is not an image."""
+    try:
+        with open(path, "rb") as handle:
+            content = handle.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+        thumbnail_path = os.path.join(thumbnail_dir, content_hash[:2], f"{content_hash}.jpg")
+        with Image.open(io.BytesIO(content)) as image:
+            width, height = image.size
+            if not os.path.exists(thumbnail_path):
+                image.draft("RGB", (size * 2, size * 2))
+                thumbnail = ImageOps.fit(image.convert("RGB"), (size, size))
+                os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+                partial = f"{thumbnail_path}.{os.getpid()}.tmp"
+                thumbnail.save(partial, format="JPEG", quality=85)
+                os.replace(partial, thumbnail_path)
+    except (OSError, ValueError):
+        return None
+    return {"width": width, "height": height, "content_hash": content_hash, "thumbnail_path": thumbnail_path}
+
+
+def _batches(items: Iterator[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    batch: List[Tuple[str, str]] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_scene_images(
+    root: str,
+    *,
+    thumbnail_dir: str,
+    size: int,
+    workers: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Iterator[IngestStats]:
+    """Ingest ``root`` and yield the running totals after every batch.
+
+    Images whose content hash is already stored (or repeats within the run) are skipped.
+    ``bulk_create`` does not send ``post_save``, so the scene index is invalidated once at the end.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to ingest scene images")
+    stats = IngestStats()
+    workers = workers or os.cpu_count() or 1
+    seen: Set[str] = set(
+        SceneImage.objects.exclude(content_hash=None).values_list("content_hash", flat=True).iterator(chunk_size=10000)
+    )
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch in _batches(iter_images(root), batch_size):
+                results = executor.map(
+                    process_image,
+                    [path for _, path in batch],
+                    [thumbnail_dir] * len(batch),
+                    [size] * len(batch),
+                    chunksize=max(1, len(batch) // (4 * workers)),
+                )
+                rows: List[SceneImage] = []
+                for (category, path), result in zip(batch, results):
+                    stats.scanned += 1
+                    if result is None:
+                        stats.failed += 1
+                        continue
+                    if result["content_hash"] in seen:
+                        stats.duplicates += 1
+                        continue
+                    seen.add(result["content_hash"])
+                    stats.categories[category] = stats.categories.get(category, 0) + 1
+                    rows.append(
+                        SceneImage(
+                            category=category,
+                            file_path=_stored_path(path),
+                            width=result["width"],
+                            height=result["height"],
+                            content_hash=result["content_hash"],
+                            thumbnail_path=_stored_path(result["thumbnail_path"]),
+                        )
+                    )
+                if rows:
+                    SceneImage.objects.bulk_create(rows, batch_size=500)
+                stats.created += len(rows)
+                yield stats
+    finally:
+        if stats.created:
+            get_scene_index().invalidate()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .rendering import Image
+
+try:  # pragma: no cover - optional dependency during tests
+    from PIL import ImageOps
+except Exception:  # pragma: no cover
+    ImageOps = None  # type: ignore
+
+SPRITE_GAP = 4
+
+
+def resolve_scene_path(file_path: str) -> str:
+    """``SceneImage.file_path`` is absolute or relative to ``MEDIA_ROOT``."""
+    return file_path if os.path.isabs(file_path) else os.path.join(settings.MEDIA_ROOT, file_path)
+
+
+class ThumbnailCache:
+    """LRU of decoded scene images already cropped to a ``size`` × ``size`` square.
+
+    Entries are keyed by image id and file path, so pointing a row at a new file misses. A file
+    that is missing or unreadable gets a flat placeholder tile (also cached) so a broken upload
+    never fails the whole challenge.
+    """
+
+    def __init__(self, *, size: int, capacity: int) -> None:
+        self.size = size
+        self.capacity = max(1, capacity)
+        self._thumbnails: "OrderedDict[Tuple[int, str], object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, image_id: int, file_path: str):
+        try:
+            with Image.open(resolve_scene_path(file_path)) as image:
+                if image.size == (self.size, self.size):
+                    # Thumbnail written by ingest_scene_images: decode only.
+                    return image.convert("RGB")
+                image.draft("RGB", (self.size * 2, self.size * 2))
+                return ImageOps.fit(image.convert("RGB"), (self.size, self.size))
+        except (OSError, ValueError):
+            shade = hashlib.blake2b(str(image_id).encode(), digest_size=3).digest()
+            return Image.new("RGB", (self.size, self.size), tuple(160 + byte % 80 for byte in shade))
+
+    def get(self, image_id: int, file_path: str):
+        key = (image_id, file_path)
+        with self._lock:
+            thumbnail = self._thumbnails.get(key)
+            if thumbnail is not None:
+                self._thumbnails.move_to_end(key)
+                self.hits += 1
+                return thumbnail
+            self.misses += 1
+        # Decode outside the lock; two threads missing on the same id just both decode it.
+        thumbnail = self._load(image_id, file_path)
+        with self._lock:
+            self._thumbnails[key] = thumbnail
+            self._thumbnails.move_to_end(key)
+            while len(self._thumbnails) > self.capacity:
+                self._thumbnails.popitem(last=False)
+        return thumbnail
+
+    def clear(self) -> None:
+        with self._lock:
+            self._thumbnails.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._thumbnails), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+
+def compose_sprite(images: List[Tuple[int, str]], cache: ThumbnailCache) -> Tuple[object, List[Dict[str, int]], int]:
+    """Paste thumbnails into a square-ish grid; returns the sprite, each cell's box and the column count."""
+    size = cache.size
+    columns = max(1, math.ceil(math.sqrt(len(images))))
+    rows = max(1, math.ceil(len(images) / columns))
+    sprite = Image.new(
+        "RGB", (columns * size + (columns - 1) * SPRITE_GAP, rows * size + (rows - 1) * SPRITE_GAP), (255, 255, 255)
+    )
+    cells: List[Dict[str, int]] = []
+    for index, (image_id, file_path) in enumerate(images):
+        x = (index % columns) * (size + SPRITE_GAP)
+        y = (index // columns) * (size + SPRITE_GAP)
+        sprite.paste(cache.get(image_id, file_path), (x, y))
+        cells.append({"id": image_id, "x": x, "y": y, "width": size, "height": size})
+    return sprite, cells, columns
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache(
+                    size=settings.CAPTCHA_SCENE_THUMBNAIL_SIZE,
+                    capacity=settings.CAPTCHA_SCENE_THUMBNAIL_CACHE_SIZE,
+                )
+    return _cache
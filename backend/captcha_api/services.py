@@ -1,25 +1,49 @@
 from __future__ import annotations
 
-import base64
-import io
-import random
-import string
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from django.core.cache import cache
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import reverse
 from django.utils.crypto import get_random_string
 
-from activity.models import CaptchaType, SceneImage
-
-try:  # pragma: no cover - optional dependency during tests
-    from PIL import Image, ImageDraw, ImageFilter
-except Exception:  # pragma: no cover
-    Image = ImageDraw = ImageFilter = None  # type: ignore
+from activity.models import CaptchaType
+from captcha_backend.metrics import Counter, Histogram
 
+from .catalog import DEFAULT_CAPTCHA_TYPE, get_catalog
+from .glyphs import DEFAULT_FONT_SIZE
+from .noise import resolve_engine
+from .pool import ChallengePool, ChallengeSpec
+from .rendering import EncodedImage, Image, RenderedChallenge, encode_image, normalize_encoding, render_batch
+from .scene_index import SceneSample, get_scene_index
+from .scene_sprites import compose_sprite, get_thumbnail_cache
+from .signed_tokens import SealedChallenge, canonical_answer, get_token_signer
+from .token_store import get_token_store
 
 CACHE_PREFIX = "captcha-token"
+IMAGE_CACHE_PREFIX = "captcha-image"
+ATTEMPT_CACHE_PREFIX = "captcha-attempts"
+SPENT_CACHE_PREFIX = "captcha-spent"
+TOKEN_TTL = 60
+IMAGE_MODES = ("inline", "url")
+SLIDER_TOLERANCE = 5
+TEXT_LENGTH_MIN = 4
+TEXT_LENGTH_MAX = 8
+# Scene sprites are photos; JPEG is a fraction of the PNG size. Override with the scene type's "encoding".
+SCENE_SPRITE_ENCODING = {"format": "jpeg", "quality": 75}
+
+RENDER_SECONDS = Histogram("captcha_render_seconds", "Challenge rendering time on a pool miss.")
+ISSUE_SECONDS = Histogram("captcha_issue_seconds", "Time to issue a challenge, including storing its token.")
+VERIFY_SECONDS = Histogram("captcha_verify_seconds", "Time to verify an answer, including token store round trips.")
+POOL_REQUESTS = Counter("captcha_pool_requests_total", "Pre-rendered pool lookups by result.")
 
 
 @dataclass
@@ -29,141 +53,319 @@ class CaptchaPayload:
     data: Dict[str, object]
 
 
+def pack_answer(answer: object, captcha_type: str) -> bytes:
+    return json.dumps({"answer": answer, "captcha_type": captcha_type}, separators=(",", ":")).encode()
+
+
+def unpack_answer(raw: Optional[bytes]) -> Optional[Dict[str, object]]:
+    return json.loads(raw) if raw else None
+
+
+def pack_image(image: EncodedImage) -> bytes:
+    """Content type and etag lines followed by the encoded image bytes."""
+    etag = hashlib.blake2b(image.content, digest_size=16).hexdigest()
+    return b"%s\n%s\n%s" % (image.content_type.encode(), etag.encode(), image.content)
+
+
+def unpack_image(raw: Optional[bytes]) -> Optional[Dict[str, object]]:
+    if not raw:
+        return None
+    content_type, etag, content = raw.split(b"\n", 2)
+    return {"content": content, "content_type": content_type.decode(), "etag": etag.decode()}
+
+
+class CaptchaRenderer:
+    """Renders challenges for a spec; subclasses decide where the drawing work runs."""
+
+    def render(self, spec: ChallengeSpec) -> RenderedChallenge:
+        return self.render_batch(spec, 1)[0]
+
+    def render_batch(self, spec: ChallengeSpec, n: int) -> List[RenderedChallenge]:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class LocalRenderer(CaptchaRenderer):
+    """Renders in the calling thread."""
+
+    def render_batch(self, spec: ChallengeSpec, n: int) -> List[RenderedChallenge]:
+        return render_batch(spec, n)
+
+
+class ProcessPoolRenderer(CaptchaRenderer):
+    """Fans rendering out to a ``ProcessPoolExecutor`` so Pillow work is not bound by the GIL."""
+
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = pid
+        return self._executor
+
+    def render_batch(self, spec: ChallengeSpec, n: int) -> List[RenderedChallenge]:
+        if n <= 0:
+            return []
+        chunk = -(-n // self.workers)
+        sizes = [min(chunk, n - start) for start in range(0, n, chunk)]
+        rendered: List[RenderedChallenge] = []
+        for batch in self._get_executor().map(render_batch, [spec] * len(sizes), sizes):
+            rendered.extend(batch)
+        return rendered
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+_renderer: Optional[CaptchaRenderer] = None
+_pool: Optional[ChallengePool[RenderedChallenge]] = None
+_pool_lock = threading.Lock()
+
+
+def get_renderer() -> CaptchaRenderer:
+    global _renderer
+    if _renderer is None:
+        with _pool_lock:
+            if _renderer is None:
+                if settings.CAPTCHA_RENDERER == "process":
+                    _renderer = ProcessPoolRenderer(workers=settings.CAPTCHA_RENDER_WORKERS)
+                else:
+                    _renderer = LocalRenderer()
+    return _renderer
+
+
+def get_challenge_pool() -> Optional[ChallengePool[RenderedChallenge]]:
+    global _pool
+    if not settings.CAPTCHA_POOL_ENABLED or Image is None:
+        return None
+    if _pool is None:
+        renderer = get_renderer()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ChallengePool(
+                    renderer.render_batch,
+                    capacity=settings.CAPTCHA_POOL_SIZE,
+                    low_watermark=settings.CAPTCHA_POOL_LOW_WATERMARK,
+                    refill_batch=settings.CAPTCHA_POOL_REFILL_BATCH,
+                    max_specs=settings.CAPTCHA_POOL_MAX_SPECS,
+                    interval=settings.CAPTCHA_POOL_REFILL_INTERVAL,
+                    specs=[_text_spec(5, {}), _slider_spec({})],
+                )
+    return _pool
+
+
+def get_type_config(type_name: str) -> Dict[str, object]:
+    return get_catalog().get_config(type_name)
+
+
+def clamp_length(value: object) -> int:
+    """Text challenge length bounded to ``TEXT_LENGTH_MIN``..``TEXT_LENGTH_MAX``; raises ``ValueError`` if not an int."""
+    try:
+        length = int(value)
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: JSON such as 1e999 parses to inf.
+        raise ValueError(value)
+    return min(max(length, TEXT_LENGTH_MIN), TEXT_LENGTH_MAX)
+
+
+def _configured_length(config: Dict[str, object]) -> int:
+    try:
+        return clamp_length(config.get("length", 5))
+    except ValueError:
+        return 5
+
+
+def _noise_engine(config: Dict[str, object]) -> str:
+    return resolve_engine(str(config.get("noise") or settings.CAPTCHA_NOISE_ENGINE).lower())
+
+
+def _text_spec(length: int, config: Dict[str, object]) -> ChallengeSpec:
+    try:
+        font_size = min(max(int(config.get("font_size", DEFAULT_FONT_SIZE)), 8), 48)
+    except (TypeError, ValueError):
+        font_size = DEFAULT_FONT_SIZE
+    return ChallengeSpec.build(
+        "text",
+        length=length,
+        encoding=normalize_encoding(config.get("encoding")),
+        font_path=str(config.get("font_path") or "") or None,
+        font_size=font_size,
+        noise=_noise_engine(config),
+    )
+
+
+def _background_source(config: Dict[str, object]) -> Optional[str]:
+    """Uploaded slider backgrounds: a file or directory, relative paths resolved against MEDIA_ROOT."""
+    path = str(config.get("image_path") or settings.CAPTCHA_SLIDER_BACKGROUNDS or "")
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(settings.MEDIA_ROOT, path)
+
+
+def _slider_spec(config: Dict[str, object]) -> ChallengeSpec:
+    return ChallengeSpec.build(
+        "slider",
+        encoding=normalize_encoding(config.get("encoding")),
+        background_encoding=normalize_encoding(config.get("background_encoding")),
+        noise=_noise_engine(config),
+        backgrounds=_background_source(config),
+    )
+
+
 class CaptchaService:
     """Utility helpers for generating captcha challenges."""
 
     @staticmethod
-    def _store_expected_answer(token: str, *, answer: object, captcha_type: str) -> None:
-        cache.set(
-            f"{CACHE_PREFIX}:{token}",
-            {"answer": answer, "captcha_type": captcha_type, "created_at": timezone.now()},
-            timeout=60,
-        )
+    def _answer_entry(token: str, *, answer: object, captcha_type: str) -> Tuple[str, bytes]:
+        return f"{CACHE_PREFIX}:{token}", pack_answer(answer, captcha_type)
 
     @staticmethod
-    def generate_text_captcha(length: int = 5) -> CaptchaPayload:
-        characters = string.ascii_uppercase + string.digits
-        solution = "".join(random.choice(characters) for _ in range(length))
+    def _new_token(*, answer: object, captcha_type: str) -> Tuple[str, str, Dict[str, bytes]]:
+        """Return the token, the key its url-mode images are stored under, and the answer entries.
+
+        Signed tokens carry their answer, so nothing is written until the challenge is verified.
+        """
+        if settings.CAPTCHA_TOKEN_MODE == "signed":
+            token, nonce = get_token_signer().seal(captcha_type, canonical_answer(captcha_type, answer))
+            return token, nonce, {}
         token = get_random_string(32)
-        image_data = CaptchaService._render_text(solution)
-        CaptchaService._store_expected_answer(token, answer=solution, captcha_type="text")
-        return CaptchaPayload(
-            token=token,
-            type="text",
-            data={"image": image_data, "length": length},
-        )
+        key, value = CaptchaService._answer_entry(token, answer=answer, captcha_type=captcha_type)
+        return token, token, {key: value}
 
     @staticmethod
-    def _render_text(text: str) -> str:
-        if Image is None:
-            return text  # Fallback for environments without Pillow
-        width, height = 160, 60
-        image = Image.new("RGB", (width, height), (255, 255, 255))
-        draw = ImageDraw.Draw(image)
-
-        for _ in range(5):
-            start = (random.randint(0, width), random.randint(0, height))
-            end = (random.randint(0, width), random.randint(0, height))
-            color = tuple(random.randint(100, 200) for _ in range(3))
-            draw.line([start, end], fill=color, width=2)
+    def _image_entries(token: str, images: Dict[str, EncodedImage]) -> Dict[str, bytes]:
+        return {f"{IMAGE_CACHE_PREFIX}:{token}:{name}": pack_image(image) for name, image in images.items()}
 
-        try:
-            from PIL import ImageFont
-
-            font = ImageFont.load_default()
-        except Exception:  # pragma: no cover
-            font = None
+    @staticmethod
+    def load_image(token: str, part: str) -> Optional[Dict[str, object]]:
+        return unpack_image(get_token_store().get(f"{IMAGE_CACHE_PREFIX}:{token}:{part}"))
 
-        for index, char in enumerate(text):
-            position = (10 + index * 28, random.randint(5, 15))
-            color = tuple(random.randint(0, 150) for _ in range(3))
-            draw.text(position, char, font=font, fill=color)
+    @staticmethod
+    def _pooled(spec: ChallengeSpec) -> Optional[RenderedChallenge]:
+        pool = get_challenge_pool()
+        rendered = pool.acquire(spec) if pool is not None else None
+        if pool is not None:
+            POOL_REQUESTS.inc(kind=spec.kind, result="hit" if rendered is not None else "miss")
+        return rendered
 
-        image = image.filter(ImageFilter.SMOOTH)
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return f"data:image/png;base64,{encoded}"
+    @staticmethod
+    def _prepare(rendered: RenderedChallenge, image_mode: Optional[str]) -> Tuple[CaptchaPayload, Dict[str, bytes]]:
+        """Assign a token and build the response plus every store entry to write in one round trip."""
+        if image_mode not in IMAGE_MODES:
+            image_mode = settings.CAPTCHA_IMAGE_MODE
+        token, image_key, entries = CaptchaService._new_token(answer=rendered.answer, captcha_type=rendered.type)
+        if image_mode == "url" and rendered.images:
+            data: Dict[str, object] = dict(rendered.extra)
+            entries.update(CaptchaService._image_entries(image_key, rendered.images))
+            data.update({name: reverse("captcha_image", args=[image_key, name]) for name in rendered.images})
+        else:
+            data = rendered.to_data()
+        return CaptchaPayload(token=token, type=rendered.type, data=data), entries
 
     @staticmethod
-    def generate_slider_captcha() -> CaptchaPayload:
-        token = get_random_string(32)
-        background, piece, target_offset = CaptchaService._create_slider_assets()
-        CaptchaService._store_expected_answer(token, answer=target_offset, captcha_type="slider")
-        return CaptchaPayload(
-            token=token,
-            type="slider",
-            data={"background": background, "piece": piece, "target_offset": target_offset},
-        )
+    def _issue(spec: ChallengeSpec, image_mode: Optional[str] = None, *, pooled: bool = True) -> CaptchaPayload:
+        started = time.perf_counter()
+        rendered = CaptchaService._pooled(spec) if pooled else None
+        if rendered is None:
+            with RENDER_SECONDS.time(kind=spec.kind):
+                rendered = get_renderer().render(spec)
+        payload, entries = CaptchaService._prepare(rendered, image_mode)
+        if entries:
+            get_token_store().set_many(entries, TOKEN_TTL)
+        ISSUE_SECONDS.observe(time.perf_counter() - started, kind=spec.kind)
+        return payload
 
     @staticmethod
-    def _create_slider_assets() -> Tuple[str, str, int]:
-        if Image is None:
-            placeholder = base64.b64encode(b"slider-placeholder").decode("utf-8")
-            return (placeholder, placeholder, 30)
-        width, height = 240, 120
-        gap_width = 40
-        gap_height = 40
-        offset_x = random.randint(60, width - gap_width - 10)
-        offset_y = random.randint(20, height - gap_height - 20)
+    async def _aissue(
+        spec: ChallengeSpec, image_mode: Optional[str] = None, *, pooled: bool = True
+    ) -> CaptchaPayload:
+        started = time.perf_counter()
+        rendered = CaptchaService._pooled(spec) if pooled else None
+        if rendered is None:
+            loop = asyncio.get_running_loop()
+            with RENDER_SECONDS.time(kind=spec.kind):
+                rendered = await loop.run_in_executor(None, get_renderer().render, spec)
+        payload, entries = CaptchaService._prepare(rendered, image_mode)
+        if entries:
+            await get_token_store().aset_many(entries, TOKEN_TTL)
+        ISSUE_SECONDS.observe(time.perf_counter() - started, kind=spec.kind)
+        return payload
 
-        background = Image.new("RGB", (width, height), (240, 240, 240))
-        draw = ImageDraw.Draw(background)
-        for _ in range(80):
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            radius = random.randint(10, 20)
-            color = tuple(random.randint(120, 200) for _ in range(3))
-            draw.ellipse((x, y, x + radius, y + radius), fill=color, outline=None)
+    @staticmethod
+    def generate_text_captcha(length: Optional[int] = None, image_mode: Optional[str] = None) -> CaptchaPayload:
+        config = get_type_config("text")
+        configured = _configured_length(config)
+        length = configured if length is None else clamp_length(length)
+        # Only the configured length is pre-rendered, so client-chosen lengths cannot claim pool slots.
+        return CaptchaService._issue(_text_spec(length, config), image_mode, pooled=length == configured)
 
-        piece = Image.new("RGBA", (gap_width, gap_height))
-        piece.paste(background.crop((offset_x, offset_y, offset_x + gap_width, offset_y + gap_height)))
+    @staticmethod
+    async def agenerate_text_captcha(length: Optional[int] = None, image_mode: Optional[str] = None) -> CaptchaPayload:
+        config = await get_catalog().aget_config("text")
+        configured = _configured_length(config)
+        length = configured if length is None else clamp_length(length)
+        return await CaptchaService._aissue(_text_spec(length, config), image_mode, pooled=length == configured)
 
-        draw.rectangle((offset_x, offset_y, offset_x + gap_width, offset_y + gap_height), fill=(255, 255, 255))
+    @staticmethod
+    def generate_slider_captcha(image_mode: Optional[str] = None) -> CaptchaPayload:
+        return CaptchaService._issue(_slider_spec(get_type_config("slider")), image_mode)
 
-        background_buffer = io.BytesIO()
-        background.save(background_buffer, format="PNG")
+    @staticmethod
+    async def agenerate_slider_captcha(image_mode: Optional[str] = None) -> CaptchaPayload:
+        return await CaptchaService._aissue(_slider_spec(await get_catalog().aget_config("slider")), image_mode)
 
-        piece_buffer = io.BytesIO()
-        piece.save(piece_buffer, format="PNG")
+    @staticmethod
+    async def agenerate_scene_selection(image_mode: Optional[str] = None) -> CaptchaPayload:
+        # The index sample is in-memory; a stale index reloads from the ORM, which must run in a thread.
+        return await sync_to_async(CaptchaService.generate_scene_selection)(image_mode)
 
-        background_encoded = base64.b64encode(background_buffer.getvalue()).decode("utf-8")
-        piece_encoded = base64.b64encode(piece_buffer.getvalue()).decode("utf-8")
-        return (f"data:image/png;base64,{background_encoded}", f"data:image/png;base64,{piece_encoded}", offset_x)
+    @staticmethod
+    def _render_scene(sample: Optional[SceneSample], config: Dict[str, object]) -> RenderedChallenge:
+        """One sprite of the sampled thumbnails plus each image's box in it, instead of nine file paths."""
+        if sample is None:
+            return RenderedChallenge(type="scene", answer=[], extra={"category": "cat", "images": []})
+        extra: Dict[str, object] = {"category": sample.category}
+        if Image is None:
+            extra["images"] = [{"id": image_id} for image_id, _ in sample.images]
+            return RenderedChallenge(type="scene", answer=sample.answer, extra=extra)
+        sprite, cells, columns = compose_sprite(sample.images, get_thumbnail_cache())
+        encoding = normalize_encoding(config.get("encoding") or SCENE_SPRITE_ENCODING)
+        extra.update({"images": cells, "columns": columns})
+        return RenderedChallenge(
+            type="scene", answer=sample.answer, images={"sprite": encode_image(sprite, encoding)}, extra=extra
+        )
 
     @staticmethod
-    def generate_scene_selection() -> CaptchaPayload:
-        token = get_random_string(32)
-        categories = list(SceneImage.objects.values_list("category", flat=True).distinct())
-        if categories:
-            category = random.choice(categories)
-            candidates = list(SceneImage.objects.filter(category=category).order_by("id")[:9])
-        else:
-            category = "cat"
-            candidates = []
-        selected_ids: List[int] = []
-        for image in candidates:
-            selected_ids.append(image.id)
-
-        CaptchaService._store_expected_answer(token, answer=sorted(selected_ids), captcha_type="scene")
-        return CaptchaPayload(
-            token=token,
-            type="scene",
-            data={
-                "category": category,
-                "images": [
-                    {"id": image.id, "file_path": image.file_path, "category": image.category}
-                    for image in candidates
-                ],
-            },
+    def generate_scene_selection(image_mode: Optional[str] = None) -> CaptchaPayload:
+        started = time.perf_counter()
+        sample = get_scene_index().sample(
+            size=settings.CAPTCHA_SCENE_GRID_SIZE,
+            min_targets=settings.CAPTCHA_SCENE_MIN_TARGETS,
+            max_targets=settings.CAPTCHA_SCENE_MAX_TARGETS,
         )
+        with RENDER_SECONDS.time(kind="scene"):
+            rendered = CaptchaService._render_scene(sample, get_type_config("scene"))
+        payload, entries = CaptchaService._prepare(rendered, image_mode)
+        if entries:
+            get_token_store().set_many(entries, TOKEN_TTL)
+        ISSUE_SECONDS.observe(time.perf_counter() - started, kind="scene")
+        return payload
 
 
 class CaptchaVerifier:
     @staticmethod
-    def verify(token: str, answer: object) -> Tuple[bool, str, str]:
-        cache_key = f"{CACHE_PREFIX}:{token}"
-        payload = cache.get(cache_key)
+    def _check(payload: Optional[Dict[str, object]], answer: object) -> Tuple[bool, str, str]:
         if not payload:
             return False, "expired", "验证码已过期或不存在"
 
@@ -172,28 +374,164 @@ class CaptchaVerifier:
 
         if captcha_type == "text":
             if isinstance(answer, str) and answer.upper() == str(expected).upper():
-                cache.delete(cache_key)
                 return True, captcha_type, "验证成功"
         elif captcha_type == "slider":
             try:
                 offset = int(answer)
             except (TypeError, ValueError):
                 return False, captcha_type, "滑块位置无效"
-            tolerance = 5
-            if abs(offset - int(expected)) <= tolerance:
-                cache.delete(cache_key)
+            if abs(offset - int(expected)) <= SLIDER_TOLERANCE:
                 return True, captcha_type, "验证成功"
         elif captcha_type == "scene":
             if isinstance(answer, list) and sorted(int(x) for x in answer) == list(expected):
-                cache.delete(cache_key)
                 return True, captcha_type, "验证成功"
 
         return False, captcha_type, "验证码错误"
 
+    @staticmethod
+    def _check_sealed(sealed: Optional[SealedChallenge], answer: object) -> Tuple[bool, str, str]:
+        """``_check`` for signed tokens: compare keyed hashes of every acceptable answer."""
+        if sealed is None:
+            return False, "expired", "验证码已过期或不存在"
+
+        captcha_type = sealed.captcha_type
+        candidates: List[str] = []
+        if captcha_type == "text":
+            if isinstance(answer, str):
+                candidates = [canonical_answer(captcha_type, answer)]
+        elif captcha_type == "slider":
+            try:
+                offset = int(answer)
+            except (TypeError, ValueError):
+                return False, captcha_type, "滑块位置无效"
+            candidates = [str(offset + delta) for delta in range(-SLIDER_TOLERANCE, SLIDER_TOLERANCE + 1)]
+        elif captcha_type == "scene":
+            if isinstance(answer, list):
+                candidates = [canonical_answer(captcha_type, answer)]
+
+        if get_token_signer().matches(sealed, candidates):
+            return True, captcha_type, "验证成功"
+        return False, captcha_type, "验证码错误"
+
+    @staticmethod
+    def _consumed(result: Tuple[bool, str, str], taken: Optional[bytes]) -> Tuple[bool, str, str]:
+        # A concurrent request consumed the token between our read and take.
+        if result[0] and taken is None:
+            return False, result[1], "验证码已过期或不存在"
+        return result
+
+    @staticmethod
+    def _attempted(result: Tuple[bool, str, str], attempts: int) -> Tuple[bool, str, str]:
+        # A wrong answer on the last allowed attempt retires the token.
+        if attempts >= settings.CAPTCHA_MAX_ATTEMPTS:
+            return False, result[1], "错误次数过多，请刷新验证码"
+        return result
+
+    @staticmethod
+    def _verify_signed(token: str, answer: object) -> Tuple[bool, str, str]:
+        # A spent marker (written on success or lockout) is the only state a signed token has.
+        sealed = get_token_signer().open(token, TOKEN_TTL)
+        if sealed is None:
+            return CaptchaVerifier._check_sealed(sealed, answer)
+        store = get_token_store()
+        spent_key = f"{SPENT_CACHE_PREFIX}:{sealed.nonce}"
+        attempts = store.record_attempt(
+            None, f"{ATTEMPT_CACHE_PREFIX}:{sealed.nonce}", TOKEN_TTL, settings.CAPTCHA_MAX_ATTEMPTS
+        )
+        if attempts > settings.CAPTCHA_MAX_ATTEMPTS or store.get(spent_key) is not None:
+            return False, sealed.captcha_type, "验证码已过期或不存在"
+        result = CaptchaVerifier._check_sealed(sealed, answer)
+        if result[0]:
+            return CaptchaVerifier._consumed(result, b"1" if store.add(spent_key, b"1", TOKEN_TTL) else None)
+        if attempts >= settings.CAPTCHA_MAX_ATTEMPTS:
+            store.add(spent_key, b"0", TOKEN_TTL)
+        return CaptchaVerifier._attempted(result, attempts)
+
+    @staticmethod
+    async def _averify_signed(token: str, answer: object) -> Tuple[bool, str, str]:
+        sealed = get_token_signer().open(token, TOKEN_TTL)
+        if sealed is None:
+            return CaptchaVerifier._check_sealed(sealed, answer)
+        store = get_token_store()
+        spent_key = f"{SPENT_CACHE_PREFIX}:{sealed.nonce}"
+        attempts = await store.arecord_attempt(
+            None, f"{ATTEMPT_CACHE_PREFIX}:{sealed.nonce}", TOKEN_TTL, settings.CAPTCHA_MAX_ATTEMPTS
+        )
+        if attempts > settings.CAPTCHA_MAX_ATTEMPTS or await store.aget(spent_key) is not None:
+            return False, sealed.captcha_type, "验证码已过期或不存在"
+        result = CaptchaVerifier._check_sealed(sealed, answer)
+        if result[0]:
+            return CaptchaVerifier._consumed(result, b"1" if await store.aadd(spent_key, b"1", TOKEN_TTL) else None)
+        if attempts >= settings.CAPTCHA_MAX_ATTEMPTS:
+            await store.aadd(spent_key, b"0", TOKEN_TTL)
+        return CaptchaVerifier._attempted(result, attempts)
+
+    @staticmethod
+    def _observe(started: float, result: Tuple[bool, str, str]) -> Tuple[bool, str, str]:
+        VERIFY_SECONDS.observe(
+            time.perf_counter() - started, type=result[1], outcome="success" if result[0] else "failed"
+        )
+        return result
+
+    @staticmethod
+    def verify(token: str, answer: object) -> Tuple[bool, str, str]:
+        started = time.perf_counter()
+        return CaptchaVerifier._observe(started, CaptchaVerifier._verify(token, answer))
+
+    @staticmethod
+    async def averify(token: str, answer: object) -> Tuple[bool, str, str]:
+        started = time.perf_counter()
+        return CaptchaVerifier._observe(started, await CaptchaVerifier._averify(token, answer))
+
+    @staticmethod
+    def _verify(token: str, answer: object) -> Tuple[bool, str, str]:
+        """Count the attempt before comparing; only the first ``CAPTCHA_MAX_ATTEMPTS`` callers get a comparison.
+
+        Each caller gets its own attempt number from one atomic store op, so concurrent guesses
+        cannot exceed the limit; a correct answer then consumes the token with an atomic take.
+        The answer is read before counting so that a caller within the limit still sees it when a
+        later, over-limit attempt has already deleted the token.
+        """
+        if settings.CAPTCHA_TOKEN_MODE == "signed":
+            return CaptchaVerifier._verify_signed(token, answer)
+        store = get_token_store()
+        key = f"{CACHE_PREFIX}:{token}"
+        payload = unpack_answer(store.get(key))
+        attempts = store.record_attempt(
+            key, f"{ATTEMPT_CACHE_PREFIX}:{token}", TOKEN_TTL, settings.CAPTCHA_MAX_ATTEMPTS
+        )
+        result = CaptchaVerifier._check(payload if attempts <= settings.CAPTCHA_MAX_ATTEMPTS else None, answer)
+        if result[0]:
+            return CaptchaVerifier._consumed(result, store.take(key))
+        if result[1] == "expired":
+            return result
+        if attempts >= settings.CAPTCHA_MAX_ATTEMPTS:
+            store.delete(key)
+        return CaptchaVerifier._attempted(result, attempts)
+
+    @staticmethod
+    async def _averify(token: str, answer: object) -> Tuple[bool, str, str]:
+        if settings.CAPTCHA_TOKEN_MODE == "signed":
+            return await CaptchaVerifier._averify_signed(token, answer)
+        store = get_token_store()
+        key = f"{CACHE_PREFIX}:{token}"
+        payload = unpack_answer(await store.aget(key))
+        attempts = await store.arecord_attempt(
+            key, f"{ATTEMPT_CACHE_PREFIX}:{token}", TOKEN_TTL, settings.CAPTCHA_MAX_ATTEMPTS
+        )
+        result = CaptchaVerifier._check(payload if attempts <= settings.CAPTCHA_MAX_ATTEMPTS else None, answer)
+        if result[0]:
+            return CaptchaVerifier._consumed(result, await store.atake(key))
+        if result[1] == "expired":
+            return result
+        if attempts >= settings.CAPTCHA_MAX_ATTEMPTS:
+            await store.adelete(key)
+        return CaptchaVerifier._attempted(result, attempts)
+
 
 def get_default_captcha_type() -> CaptchaType:
     captcha_type, _ = CaptchaType.objects.get_or_create(
-        type_name="text",
-        defaults={"description": "默认字符验证码", "config_json": {"length": 5}},
+        type_name=DEFAULT_CAPTCHA_TYPE["type_name"],
+        defaults={key: value for key, value in DEFAULT_CAPTCHA_TYPE.items() if key != "type_name"},
     )
     return captcha_type
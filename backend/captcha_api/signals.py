@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from activity.models import CaptchaType, SceneImage
+
+from .catalog import get_catalog
+from .scene_index import get_scene_index
+
+
+@receiver(post_save, sender=CaptchaType)
+@receiver(post_delete, sender=CaptchaType)
+def invalidate_catalog(sender, **kwargs):
+    # Bump the version only after commit so no process can reload the old rows under the new version.
+    transaction.on_commit(get_catalog().invalidate)
+
+
+@receiver(post_save, sender=SceneImage)
+@receiver(post_delete, sender=SceneImage)
+def invalidate_scene_index(sender, **kwargs):
+    transaction.on_commit(get_scene_index().invalidate)
@@ -0,0 +1,104 @@
+"""Stateless captcha tokens: the expected answer travels inside the token as a keyed hash.
+
+The token carries ``{nonce, type, hmac(answer)}`` and is encrypted with Fernet when
+``cryptography`` is installed, otherwise signed with ``django.core.signing``. Either way it is
+keyed from ``SECRET_KEY`` and rejected once older than ``max_age`` seconds, so issuing a challenge
+writes nothing server-side; only verification touches the token store (attempts, spent marker).
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import get_random_string, salted_hmac
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = Exception
+
+SALT = "captcha_api.signed_tokens"
+
+
+@dataclass(frozen=True)
+class SealedChallenge:
+    nonce: str
+    captcha_type: str
+    digest: str
+
+
+def canonical_answer(captcha_type: str, answer: object) -> str:
+    """Normalise an answer to the string that is hashed into (and compared against) the token."""
+    if captcha_type == "text":
+        return str(answer).upper()
+    if captcha_type == "slider":
+        return str(int(answer))
+    if captcha_type == "scene":
+        return ",".join(str(int(item)) for item in sorted(int(item) for item in answer))
+    return json.dumps(answer, separators=(",", ":"), sort_keys=True)
+
+
+class TokenSigner:
+    def __init__(self, secret: str, encrypt: bool = True) -> None:
+        self.secret = secret
+        self._fernet = None
+        if encrypt and Fernet is not None:
+            key = hashlib.sha256(f"{SALT}.encryption:{secret}".encode()).digest()
+            self._fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    @property
+    def encrypted(self) -> bool:
+        return self._fernet is not None
+
+    def digest(self, nonce: str, captcha_type: str, canonical: str) -> str:
+        return salted_hmac(
+            f"{SALT}.answer", f"{nonce}:{captcha_type}:{canonical}", secret=self.secret, algorithm="sha256"
+        ).hexdigest()[:32]
+
+    def seal(self, captcha_type: str, canonical: str) -> Tuple[str, str]:
+        """Return ``(token, nonce)`` for a challenge whose canonical answer is ``canonical``."""
+        nonce = get_random_string(16)
+        body = {"n": nonce, "t": captcha_type, "h": self.digest(nonce, captcha_type, canonical)}
+        if self._fernet is not None:
+            token = self._fernet.encrypt(json.dumps(body, separators=(",", ":")).encode()).decode()
+        else:
+            token = signing.dumps(body, key=self.secret, salt=SALT)
+        return token, nonce
+
+    def open(self, token: str, max_age: int) -> Optional[SealedChallenge]:
+        """Decode a token; ``None`` when it is forged, malformed or older than ``max_age`` seconds."""
+        try:
+            if self._fernet is not None:
+                body = json.loads(self._fernet.decrypt(token.encode(), ttl=max_age))
+            else:
+                body = signing.loads(token, key=self.secret, salt=SALT, max_age=max_age)
+            return SealedChallenge(nonce=body["n"], captcha_type=body["t"], digest=body["h"])
+        except (InvalidToken, signing.BadSignature, ValueError, TypeError, KeyError):
+            return None
+
+    def matches(self, sealed: SealedChallenge, candidates: Iterable[str]) -> bool:
+        return any(
+            hmac.compare_digest(self.digest(sealed.nonce, sealed.captcha_type, candidate), sealed.digest)
+            for candidate in candidates
+        )
+
+
+_signer: Optional[TokenSigner] = None
+_signer_lock = threading.Lock()
+
+
+def get_token_signer() -> TokenSigner:
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                _signer = TokenSigner(settings.SECRET_KEY, encrypt=settings.CAPTCHA_SIGNED_TOKEN_ENCRYPT)
+    return _signer
@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from . import token_store
+from .resp_stub import RespStub
+from .services import TEXT_LENGTH_MAX, TEXT_LENGTH_MIN, TOKEN_TTL, CaptchaService, CaptchaVerifier, clamp_length
+from .token_store import RedisTokenStore, TimedTokenStore, TokenStoreError, build_token_store
+
+
+class RedisTokenStoreTests(SimpleTestCase):
+    """``RedisTokenStore`` against the in-process RESP stand-in."""
+
+    def setUp(self):
+        self.server = RespStub(password="s3cret").start()
+        self.addCleanup(self.server.stop)
+        self.store = build_token_store(f"{self.server.url}/2")
+
+    def test_url_selects_redis_backend(self):
+        self.assertIsInstance(self.store, RedisTokenStore)
+        self.assertEqual((self.store.db, self.store.password), (2, "s3cret"))
+
+    def test_set_many_and_get(self):
+        self.store.set_many({"a": b"1", "b": b"\x00\xff binary"}, 60)
+        self.assertEqual(self.store.get("a"), b"1")
+        self.assertEqual(self.store.get("b"), b"\x00\xff binary")
+        self.assertIsNone(self.store.get("missing"))
+        self.assertEqual(self.server.keys(db=2), [b"a", b"b"])
+        self.assertEqual(self.server.keys(db=0), [])
+
+    def test_entries_expire(self):
+        self.store.set_many({"short": b"1"}, 0.05)
+        self.assertTrue(self.store.add("added", b"1", 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.store.get("short"))
+        self.assertTrue(self.store.add("added", b"2", 60))
+
+    def test_take_returns_value_once(self):
+        self.store.set_many({"token": b"answer"}, 60)
+        self.assertEqual(self.store.take("token"), b"answer")
+        self.assertIsNone(self.store.take("token"))
+        self.assertIsNone(self.store.get("token"))
+
+    def test_concurrent_take_has_one_winner(self):
+        self.store.set_many({"token": b"answer"}, 60)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def take():
+            barrier.wait()
+            results.append(self.store.take("token"))
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(b"answer"), 1)
+
+    def test_add_only_writes_absent_keys(self):
+        self.assertTrue(self.store.add("spent", b"1", 60))
+        self.assertFalse(self.store.add("spent", b"2", 60))
+        self.assertEqual(self.store.get("spent"), b"1")
+
+    def test_record_attempt_deletes_key_past_limit(self):
+        self.store.set_many({"token": b"answer"}, 60)
+        self.assertEqual(self.store.record_attempt("token", "attempts", 60, 3), 1)
+        self.assertEqual(self.store.record_attempt("token", "attempts", 60, 3), 2)
+        self.assertEqual(self.store.record_attempt("token", "attempts", 60, 3), 3)
+        self.assertEqual(self.store.get("token"), b"answer")
+        self.assertEqual(self.store.record_attempt("token", "attempts", 60, 3), 4)
+        self.assertIsNone(self.store.get("token"))
+
+    def test_concurrent_record_attempt_counts_every_caller(self):
+        self.store.set_many({"token": b"answer"}, 60)
+        barrier = threading.Barrier(8)
+        counts = []
+
+        def attempt():
+            barrier.wait()
+            counts.append(self.store.record_attempt("token", "attempts", 60, 3))
+
+        threads = [threading.Thread(target=attempt) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(counts), list(range(1, 9)))
+        self.assertIsNone(self.store.get("token"))
+
+    def test_exec_aborts_when_watched_key_changes(self):
+        other = build_token_store(f"{self.server.url}/2")
+        self.store.set_many({"counter": b"1"}, 60)
+        self.store.execute("WATCH", "counter")
+        other.execute("INCR", "counter")
+        self.assertIsNone(self.store.pipeline([("MULTI",), ("INCR", "counter"), ("EXEC",)])[-1])
+        self.assertEqual(self.store.get("counter"), b"2")
+        self.assertEqual(self.store.pipeline([("MULTI",), ("INCR", "counter"), ("EXEC",)])[-1], [3])
+
+    def test_attempt_counter_expires(self):
+        self.assertEqual(self.store.record_attempt(None, "attempts", 0.05, 3), 1)
+        time.sleep(0.1)
+        self.assertEqual(self.store.record_attempt(None, "attempts", 0.05, 3), 1)
+
+    def test_reconnects_after_dropped_connection(self):
+        self.store.set_many({"a": b"1"}, 60)
+        self.server.drop_connections()
+        self.assertEqual(self.store.get("a"), b"1")
+
+    def test_async_variants(self):
+        async def run():
+            await self.store.aset_many({"a": b"1"}, 60)
+            return await self.store.aget("a"), await self.store.atake("a"), await self.store.aget("a")
+
+        self.assertEqual(asyncio.run(run()), (b"1", b"1", None))
+
+    def test_wrong_password_raises(self):
+        store = RedisTokenStore(port=self.server.port, password="wrong")
+        with self.assertRaises(TokenStoreError):
+            store.get("a")
+
+    def test_missing_password_raises(self):
+        with self.assertRaises(TokenStoreError):
+            RedisTokenStore(port=self.server.port).get("a")
+
+
+@override_settings(CAPTCHA_TOKEN_MODE="store", CAPTCHA_MAX_ATTEMPTS=3)
+class RedisVerifyTests(SimpleTestCase):
+    """The verifier's consume-once and attempt-limit rules on top of the Redis backend."""
+
+    def setUp(self):
+        server = RespStub().start()
+        self.addCleanup(server.stop)
+        self.store = TimedTokenStore(build_token_store(server.url))
+        patcher = mock.patch.object(token_store, "_store", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def issue(self, token, answer="ABCDE"):
+        key, value = CaptchaService._answer_entry(token, answer=answer, captcha_type="text")
+        self.store.set_many({key: value}, TOKEN_TTL)
+
+    def test_correct_answer_consumes_token(self):
+        self.issue("t1")
+        self.assertEqual(CaptchaVerifier.verify("t1", "abcde"), (True, "text", "验证成功"))
+        self.assertEqual(CaptchaVerifier.verify("t1", "abcde"), (False, "expired", "验证码已过期或不存在"))
+
+    def test_attempt_limit_locks_token(self):
+        self.issue("t2")
+        self.assertEqual(CaptchaVerifier.verify("t2", "wrong"), (False, "text", "验证码错误"))
+        self.assertEqual(CaptchaVerifier.verify("t2", "wrong"), (False, "text", "验证码错误"))
+        self.assertEqual(CaptchaVerifier.verify("t2", "wrong"), (False, "text", "错误次数过多，请刷新验证码"))
+        self.assertEqual(CaptchaVerifier.verify("t2", "ABCDE"), (False, "expired", "验证码已过期或不存在"))
+
+    def test_concurrent_guesses_are_compared_at_most_max_attempts_times(self):
+        self.issue("t4")
+        check = CaptchaVerifier._check
+        compared = []
+
+        def counting_check(payload, answer):
+            if payload:
+                compared.append(answer)
+            return check(payload, answer)
+
+        barrier = threading.Barrier(8)
+        results = []
+
+        def guess(answer):
+            barrier.wait()
+            results.append(CaptchaVerifier.verify("t4", answer))
+
+        threads = [threading.Thread(target=guess, args=(f"WRONG{i}",)) for i in range(8)]
+        with mock.patch.object(CaptchaVerifier, "_check", staticmethod(counting_check)):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(compared), 3)
+        messages = sorted(message for _, _, message in results)
+        self.assertEqual(messages.count("验证码错误"), 2)
+        self.assertEqual(messages.count("错误次数过多，请刷新验证码"), 1)
+        self.assertEqual(messages.count("验证码已过期或不存在"), 5)
+
+    def test_async_verify(self):
+        self.issue("t3")
+        self.assertEqual(asyncio.run(CaptchaVerifier.averify("t3", "ABCDE")), (True, "text", "验证成功"))
+
+
+class TextLengthTests(SimpleTestCase):
+    def test_clamp_length_bounds(self):
+        self.assertEqual(clamp_length("6"), 6)
+        self.assertEqual(clamp_length(1), TEXT_LENGTH_MIN)
+        self.assertEqual(clamp_length(5000), TEXT_LENGTH_MAX)
+
+    def test_clamp_length_rejects_non_numbers(self):
+        for value in (float("inf"), float("-inf"), float("nan"), "abc", None, [5]):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                clamp_length(value)
+
+    def test_request_rejects_non_finite_length(self):
+        for body in ('{"type": "text", "config": {"length": 1e999}}', '{"type": "text", "config": {"length": NaN}}'):
+            with self.subTest(body=body):
+                response = self.client.post("/api/captcha/request", body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
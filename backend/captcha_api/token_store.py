@@ -0,0 +1,530 @@
+"""Storage for issued captcha tokens (expected answers and url-mode images).
+
+Values are opaque ``bytes`` with a TTL. Every backend supports an atomic ``take`` (get-and-delete)
+so a token can be consumed by exactly one verification even when several workers race for it.
+
+Backends are selected with ``settings.CAPTCHA_TOKEN_STORE_URL``:
+
+* ``cache://<alias>``  – a Django cache alias; only shared between processes if the cache is.
+* ``sqlite:////<absolute path>`` – a WAL-mode SQLite file, shared by every worker process on one host.
+* ``redis://[:password@]host[:port][/db]`` – any server speaking the Redis protocol (RESP2).
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from captcha_backend.metrics import Histogram
+
+STORE_SECONDS = Histogram("captcha_token_store_seconds", "Token store operation latency.")
+
+
+class TokenStoreError(Exception):
+    pass
+
+
+class TokenStore:
+    """Key/value store for short-lived token data; async variants run the sync call off the event loop."""
+
+    backend = ""
+
+    def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def take(self, key: str) -> Optional[bytes]:
+        """Atomically return and delete ``key``; only one concurrent caller receives the value."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        """Store ``value`` only if ``key`` is absent; returns whether this caller wrote it."""
+        raise NotImplementedError
+
+    def record_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        """Count an attempt and return the new count.
+
+        Once the count exceeds ``max_attempts``, ``key`` (if given) is deleted in the same atomic step,
+        so callers that count before comparing never compare more than ``max_attempts`` times.
+        """
+        raise NotImplementedError
+
+    async def aset_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        await sync_to_async(self.set_many, thread_sensitive=False)(entries, ttl)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await sync_to_async(self.get, thread_sensitive=False)(key)
+
+    async def atake(self, key: str) -> Optional[bytes]:
+        return await sync_to_async(self.take, thread_sensitive=False)(key)
+
+    async def adelete(self, key: str) -> None:
+        await sync_to_async(self.delete, thread_sensitive=False)(key)
+
+    async def aadd(self, key: str, value: bytes, ttl: int) -> bool:
+        return await sync_to_async(self.add, thread_sensitive=False)(key, value, ttl)
+
+    async def arecord_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        return await sync_to_async(self.record_attempt, thread_sensitive=False)(key, attempts_key, ttl, max_attempts)
+
+
+class CacheTokenStore(TokenStore):
+    """Django cache backend. ``take`` relies on ``delete`` reporting whether this caller removed the key."""
+
+    backend = "cache"
+
+    LOCK_TTL = 1
+
+    def __init__(self, alias: str = "default") -> None:
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        self.cache.set_many(entries, timeout=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    def take(self, key: str) -> Optional[bytes]:
+        value = self.cache.get(key)
+        if value is None or not self.cache.delete(key):
+            return None
+        return value
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return self.cache.add(key, value, timeout=ttl)
+
+    @contextmanager
+    def _locked(self, key: str) -> Iterator[None]:
+        """Mutex on ``cache.add``; the entry expires after ``LOCK_TTL`` so a dead holder cannot wedge it."""
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.LOCK_TTL
+        while not self.cache.add(lock_key, 1, timeout=self.LOCK_TTL):
+            if time.monotonic() >= deadline:
+                raise TokenStoreError(f"timed out waiting for {lock_key}")
+            time.sleep(0.002)
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
+
+    def record_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        cache = self.cache
+        with self._locked(attempts_key):
+            try:
+                attempts = cache.incr(attempts_key)
+            except ValueError:
+                # First attempt, or the previous counter expired.
+                attempts = 1
+                cache.set(attempts_key, attempts, timeout=ttl)
+            if key is not None and attempts > max_attempts:
+                cache.delete(key)
+        return attempts
+
+    async def aset_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        await self.cache.aset_many(entries, timeout=ttl)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await self.cache.aget(key)
+
+    async def atake(self, key: str) -> Optional[bytes]:
+        value = await self.cache.aget(key)
+        if value is None or not await self.cache.adelete(key):
+            return None
+        return value
+
+    async def adelete(self, key: str) -> None:
+        await self.cache.adelete(key)
+
+    async def aadd(self, key: str, value: bytes, ttl: int) -> bool:
+        return await self.cache.aadd(key, value, timeout=ttl)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Single-host store shared by all worker processes through one SQLite file in WAL mode."""
+
+    backend = "sqlite"
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are per thread and never survive a fork.
+        pid = os.getpid()
+        state: Optional[Tuple[int, sqlite3.Connection]] = getattr(self._local, "state", None)
+        if state is not None and state[0] == pid:
+            return state[1]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS captcha_tokens "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._local.state = (pid, connection)
+        return connection
+
+    def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO captcha_tokens (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, now + ttl) for key, value in entries.items()],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM captcha_tokens WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def take(self, key: str) -> Optional[bytes]:
+        connection = self._connection()
+        if sqlite3.sqlite_version_info >= (3, 35):
+            row = connection.execute(
+                "DELETE FROM captcha_tokens WHERE key = ? RETURNING value, expires_at", (key,)
+            ).fetchone()
+        else:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT value, expires_at FROM captcha_tokens WHERE key = ?", (key,)
+                ).fetchone()
+                connection.execute("DELETE FROM captcha_tokens WHERE key = ?", (key,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM captcha_tokens WHERE key = ?", (key,))
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM captcha_tokens WHERE key = ? AND expires_at <= ?", (key, now))
+            added = connection.execute(
+                "INSERT OR IGNORE INTO captcha_tokens (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            ).rowcount
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return added == 1
+
+    def record_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value, expires_at FROM captcha_tokens WHERE key = ?", (attempts_key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                attempts, expires_at = 1, now + ttl
+            else:
+                attempts, expires_at = int(row[0]) + 1, row[1]
+            connection.execute(
+                "INSERT OR REPLACE INTO captcha_tokens (key, value, expires_at) VALUES (?, ?, ?)",
+                (attempts_key, attempts, expires_at),
+            )
+            if key is not None and attempts > max_attempts:
+                connection.execute("DELETE FROM captcha_tokens WHERE key = ?", (key,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return attempts
+
+    def purge_expired(self) -> int:
+        return self._connection().execute(
+            "DELETE FROM captcha_tokens WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+
+
+class RedisTokenStore(TokenStore):
+    """Minimal RESP2 client; ``take`` uses GETDEL (Redis 6.2+ or any compatible server)."""
+
+    backend = "redis"
+
+    TRANSACTION_RETRIES = 50
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 1.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile("rb"))
+        setup: List[Tuple[object, ...]] = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in self._roundtrip(connection, setup):
+                if isinstance(reply, TokenStoreError):
+                    raise reply
+        return connection
+
+    def _connection(self):
+        pid = os.getpid()
+        state = getattr(self._local, "state", None)
+        if state is not None and state[0] == pid:
+            return state[1]
+        connection = self._connect()
+        self._local.state = (pid, connection)
+        return connection
+
+    def _close(self) -> None:
+        state = getattr(self._local, "state", None)
+        self._local.state = None
+        if state is not None:
+            try:
+                state[1][0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(commands: List[Tuple[object, ...]]) -> bytes:
+        parts: List[bytes] = []
+        for command in commands:
+            parts.append(b"*%d\r\n" % len(command))
+            for arg in command:
+                if isinstance(arg, bytes):
+                    data = arg
+                elif isinstance(arg, str):
+                    data = arg.encode()
+                else:
+                    data = str(arg).encode()
+                parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    def _read_reply(cls, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by token store server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            return TokenStoreError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("connection closed by token store server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [cls._read_reply(reader) for _ in range(length)]
+        raise TokenStoreError(f"unexpected reply: {line!r}")
+
+    def _roundtrip(self, connection, commands: List[Tuple[object, ...]]) -> list:
+        sock, reader = connection
+        sock.sendall(self._encode(commands))
+        return [self._read_reply(reader) for _ in commands]
+
+    def pipeline(self, commands: List[Tuple[object, ...]]) -> list:
+        """Send every command in one write and read the replies; reconnects once on a dropped socket."""
+        for attempt in range(2):
+            try:
+                replies = self._roundtrip(self._connection(), commands)
+                break
+            except (ConnectionError, socket.timeout, OSError):
+                self._close()
+                if attempt:
+                    raise
+        for reply in replies:
+            if isinstance(reply, TokenStoreError):
+                raise reply
+        return replies
+
+    def execute(self, *command: object):
+        return self.pipeline([command])[0]
+
+    def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        if entries:
+            self.pipeline([("SET", key, value, "PX", int(ttl * 1000)) for key, value in entries.items()])
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def take(self, key: str) -> Optional[bytes]:
+        return self.execute("GETDEL", key)
+
+    def delete(self, key: str) -> None:
+        self.execute("DEL", key)
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        return self.execute("SET", key, value, "PX", int(ttl * 1000), "NX") is not None
+
+    def record_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        # Optimistic transaction: EXEC only applies if the counter did not change since WATCH,
+        # so the increment and the conditional DEL land together or are retried.
+        for _ in range(self.TRANSACTION_RETRIES):
+            _, current = self.pipeline([("WATCH", attempts_key), ("GET", attempts_key)])
+            commands: List[Tuple[object, ...]] = [
+                ("MULTI",),
+                ("SET", attempts_key, 0, "PX", int(ttl * 1000), "NX"),
+                ("INCR", attempts_key),
+            ]
+            if key is not None and int(current or 0) + 1 > max_attempts:
+                commands.append(("DEL", key))
+            commands.append(("EXEC",))
+            replies = self.pipeline(commands)[-1]
+            if replies is not None:
+                return replies[1]
+        raise TokenStoreError(f"{attempts_key} kept changing during record_attempt")
+
+
+class TimedTokenStore(TokenStore):
+    """Wraps a backend and records each operation in ``captcha_token_store_seconds``."""
+
+    def __init__(self, inner: TokenStore) -> None:
+        self.inner = inner
+        self.backend = inner.backend
+
+    def _timed(self, op: str):
+        return STORE_SECONDS.time(backend=self.backend, op=op)
+
+    def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        with self._timed("set_many"):
+            self.inner.set_many(entries, ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._timed("get"):
+            return self.inner.get(key)
+
+    def take(self, key: str) -> Optional[bytes]:
+        with self._timed("take"):
+            return self.inner.take(key)
+
+    def delete(self, key: str) -> None:
+        with self._timed("delete"):
+            self.inner.delete(key)
+
+    def add(self, key: str, value: bytes, ttl: int) -> bool:
+        with self._timed("add"):
+            return self.inner.add(key, value, ttl)
+
+    def record_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        with self._timed("record_attempt"):
+            return self.inner.record_attempt(key, attempts_key, ttl, max_attempts)
+
+    async def aset_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        with self._timed("set_many"):
+            await self.inner.aset_many(entries, ttl)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        with self._timed("get"):
+            return await self.inner.aget(key)
+
+    async def atake(self, key: str) -> Optional[bytes]:
+        with self._timed("take"):
+            return await self.inner.atake(key)
+
+    async def adelete(self, key: str) -> None:
+        with self._timed("delete"):
+            await self.inner.adelete(key)
+
+    async def aadd(self, key: str, value: bytes, ttl: int) -> bool:
+        with self._timed("add"):
+            return await self.inner.aadd(key, value, ttl)
+
+    async def arecord_attempt(self, key: Optional[str], attempts_key: str, ttl: int, max_attempts: int) -> int:
+        with self._timed("record_attempt"):
+            return await self.inner.arecord_attempt(key, attempts_key, ttl, max_attempts)
+
+
+def build_token_store(url: str) -> TokenStore:
+    parts = urlsplit(url)
+    if parts.scheme == "cache":
+        return CacheTokenStore(parts.netloc or "default")
+    if parts.scheme == "sqlite":
+        # sqlite:///relative/path or sqlite:////absolute/path
+        path = unquote(parts.path[1:] if parts.path.startswith("/") else parts.path)
+        if not path:
+            raise TokenStoreError("sqlite token store needs a file path, e.g. sqlite:////var/run/captcha.sqlite3")
+        return SQLiteTokenStore(path)
+    if parts.scheme == "redis":
+        db = parts.path.strip("/")
+        return RedisTokenStore(
+            host=parts.hostname or "127.0.0.1",
+            port=parts.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parts.password) if parts.password else None,
+        )
+    raise TokenStoreError(f"unsupported token store url: {url}")
+
+
+_store: Optional[TokenStore] = None
+_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TimedTokenStore(build_token_store(settings.CAPTCHA_TOKEN_STORE_URL))
+    return _store
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if settings.CAPTCHA_ASYNC_VIEWS:
+    request_view, verify_view = views.arequest_captcha, views.averify
+else:
+    request_view, verify_view = views.request_captcha, views.verify
+
 urlpatterns = [
     path("available", views.available, name="captcha_available"),
-    path("request", views.request_captcha, name="captcha_request"),
-    path("verify", views.verify, name="captcha_verify"),
+    path("request", request_view, name="captcha_request"),
+    path("image/<str:token>/<str:part>", views.captcha_image, name="captcha_image"),
+    path("verify", verify_view, name="captcha_verify"),
     path("types", views.upsert_type, name="captcha_upsert"),
     path("types/<int:type_id>", views.delete_type, name="captcha_delete"),
+    path("pool", views.pool_status, name="captcha_pool"),
 ]
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
 import json
+from typing import Optional, Tuple
 
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_http_methods
 
 from activity.models import CaptchaType
-from activity.services import log_captcha_event
+from activity.services import alog_captcha_event, log_captcha_event
 
-from .services import CaptchaService, CaptchaVerifier, get_default_captcha_type
+from .catalog import get_catalog
+from .services import (
+    TOKEN_TTL,
+    CaptchaService,
+    CaptchaVerifier,
+    clamp_length,
+    get_challenge_pool,
+)
 
 
 def _parse_json(request):
@@ -23,41 +32,91 @@ def _parse_json(request):
 @csrf_exempt
 @require_GET
 def available(request):
-    data = list(
-        CaptchaType.objects.values("id", "type_name", "description", "config_json", "image_path")
-    )
-    if not data:
-        captcha_type = get_default_captcha_type()
-        data = [
-            {
-                "id": captcha_type.id,
-                "type_name": captcha_type.type_name,
-                "description": captcha_type.description,
-                "config_json": captcha_type.config_json,
-                "image_path": captcha_type.image_path,
-            }
-        ]
-    return JsonResponse({"success": True, "data": data})
+    snapshot = get_catalog().snapshot()
+    etag = f'"{snapshot.etag}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def _challenge_args(payload) -> Tuple[str, Optional[int], Optional[str]]:
+    """Raises ``ValueError`` for a malformed ``config``; lengths outside the allowed range are clamped."""
+    captcha_type = payload.get("type", "text")
+    length = None
+    if captcha_type == "text":
+        config = payload.get("config") or {}
+        if not isinstance(config, dict):
+            raise ValueError(config)
+        length = clamp_length(config["length"]) if config.get("length") is not None else None
+    elif captcha_type not in ("slider", "scene"):
+        captcha_type = "text"
+    return captcha_type, length, payload.get("image_mode")
+
+
+def _invalid_args() -> JsonResponse:
+    return JsonResponse({"success": False, "message": "验证码参数无效"}, status=400)
+
+
+def _challenge_response(challenge) -> JsonResponse:
+    return JsonResponse({"success": True, "data": challenge.data, "token": challenge.token, "type": challenge.type})
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def request_captcha(request):
-    payload = _parse_json(request)
-    captcha_type = payload.get("type", "text")
+    try:
+        captcha_type, length, image_mode = _challenge_args(_parse_json(request))
+    except ValueError:
+        return _invalid_args()
 
-    if captcha_type == "text":
-        config = payload.get("config", {})
-        length = int(config.get("length", 5))
-        challenge = CaptchaService.generate_text_captcha(length=length)
-    elif captcha_type == "slider":
-        challenge = CaptchaService.generate_slider_captcha()
+    if captcha_type == "slider":
+        challenge = CaptchaService.generate_slider_captcha(image_mode=image_mode)
     elif captcha_type == "scene":
-        challenge = CaptchaService.generate_scene_selection()
+        challenge = CaptchaService.generate_scene_selection(image_mode=image_mode)
     else:
-        challenge = CaptchaService.generate_text_captcha()
+        challenge = CaptchaService.generate_text_captcha(length=length, image_mode=image_mode)
 
-    return JsonResponse({"success": True, "data": challenge.data, "token": challenge.token, "type": challenge.type})
+    return _challenge_response(challenge)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def arequest_captcha(request):
+    try:
+        captcha_type, length, image_mode = _challenge_args(_parse_json(request))
+    except ValueError:
+        return _invalid_args()
+
+    if captcha_type == "slider":
+        challenge = await CaptchaService.agenerate_slider_captcha(image_mode=image_mode)
+    elif captcha_type == "scene":
+        challenge = await CaptchaService.agenerate_scene_selection(image_mode=image_mode)
+    else:
+        challenge = await CaptchaService.agenerate_text_captcha(length=length, image_mode=image_mode)
+
+    return _challenge_response(challenge)
+
+
+@csrf_exempt
+@require_GET
+def captcha_image(request, token: str, part: str):
+    image = CaptchaService.load_image(token, part)
+    if image is None:
+        return JsonResponse({"success": False, "message": "验证码图片已过期或不存在"}, status=404)
+
+    etag = f'"{image["etag"]}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(image["content"], content_type=image["content_type"])
+        response["Content-Length"] = str(len(image["content"]))
+    response["ETag"] = etag
+    response["Cache-Control"] = f"private, max-age={TOKEN_TTL}, immutable"
+    return response
 
 
 @csrf_exempt
@@ -81,6 +140,28 @@ def verify(request):
     return JsonResponse({"success": success, "type": captcha_type, "message": message})
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+async def averify(request):
+    payload = _parse_json(request)
+    token = payload.get("token")
+    answer = payload.get("answer")
+
+    if not token:
+        return JsonResponse({"success": False, "message": "缺少 token"}, status=400)
+
+    success, captcha_type, message = await CaptchaVerifier.averify(token, answer)
+    user = await request.auser()
+    await alog_captcha_event(
+        request=request,
+        captcha_type=captcha_type,
+        result="success" if success else "failed",
+        message=message,
+        user_id=user.id if user.is_authenticated else None,
+    )
+    return JsonResponse({"success": success, "type": captcha_type, "message": message})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @user_passes_test(lambda user: user.is_staff)
@@ -102,6 +183,8 @@ def upsert_type(request):
         captcha_type = CaptchaType.objects.get(id=type_id)
     else:
         captcha_type = CaptchaType.objects.create(**defaults)
+    # update() bypasses model signals, so invalidate explicitly.
+    transaction.on_commit(get_catalog().invalidate)
 
     return JsonResponse({"success": True, "data": {
         "id": captcha_type.id,
@@ -119,3 +202,12 @@ def upsert_type(request):
 def delete_type(request, type_id: int):
     deleted, _ = CaptchaType.objects.filter(id=type_id).delete()
     return JsonResponse({"success": bool(deleted)})
+
+
+@csrf_exempt
+@require_GET
+@user_passes_test(lambda user: user.is_staff)
+@login_required
+def pool_status(request):
+    pool = get_challenge_pool()
+    return JsonResponse({"success": True, "enabled": pool is not None, "data": pool.stats() if pool else []})
@@ -4,5 +4,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "captcha_backend.settings")
+# Serve the native async captcha and login views when running under an ASGI server.
+os.environ.setdefault("CAPTCHA_ASYNC_VIEWS", "true")
 
 application = get_asgi_application()
@@ -0,0 +1,339 @@
+"""Lightweight timing histograms and counters, exported in Prometheus text format.
+
+Observations are accumulated in process memory under one lock. A daemon thread per process
+periodically writes the process's cumulative values to a shared SQLite file, and
+``/api/metrics`` sums the latest snapshot of every live process, so the endpoint reports the
+whole host no matter which worker serves the scrape. Snapshots of exited processes are dropped,
+and gauges are reported per process (a ``pid`` label) rather than summed. Importing this module
+does not require Django to be configured; renderer worker processes only start flushing when
+settings are available.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_key(labels: Dict[str, object]) -> str:
+    return json.dumps(sorted((key, str(value)) for key, value in labels.items()), separators=(",", ":"))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, registry: Optional["MetricsRegistry"] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry or REGISTRY
+        self._values: Dict[str, List[float]] = {}
+        self.registry.register(self)
+
+    def _empty(self) -> List[float]:
+        raise NotImplementedError
+
+    def _series(self, labels: Dict[str, object]) -> List[float]:
+        key = _label_key(labels)
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = self._empty()
+        return values
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        return {key: list(values) for key, values in self._values.items()}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _empty(self) -> List[float]:
+        return [0.0]
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        with self.registry.lock:
+            self._series(labels)[0] += amount
+        self.registry.ensure_running()
+
+
+class Gauge(Metric):
+    """Current value per process; the endpoint reports one series per live process, labelled ``pid``."""
+
+    kind = "gauge"
+
+    def _empty(self) -> List[float]:
+        return [0.0]
+
+    def set(self, value: float, **labels: object) -> None:
+        with self.registry.lock:
+            self._series(labels)[0] = value
+        self.registry.ensure_running()
+
+
+class Histogram(Metric):
+    """Observations in seconds; stored as per-bucket counts followed by sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Optional["MetricsRegistry"] = None,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, registry)
+
+    def _empty(self) -> List[float]:
+        return [0.0] * (len(self.buckets) + 3)
+
+    def observe(self, seconds: float, **labels: object) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self.registry.lock:
+            values = self._series(labels)
+            values[index] += 1
+            values[-2] += seconds
+            values[-1] += 1
+        self.registry.ensure_running()
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """Time the block (or, used as a decorator, each call)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class MetricsStore:
+    """Latest cumulative snapshot per process in a SQLite file shared by the host's workers."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        state = getattr(self._local, "state", None)
+        if state is not None and state[0] == pid:
+            return state[1]
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS metric_snapshots "
+            "(process TEXT PRIMARY KEY, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._local.state = (pid, connection)
+        return connection
+
+    def write(self, process: str, data: Dict[str, Dict[str, List[float]]]) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO metric_snapshots (process, updated_at, data) VALUES (?, ?, ?)",
+            (process, time.time(), json.dumps(data, separators=(",", ":"))),
+        )
+
+    def read_all(self, retention: float) -> List[Tuple[str, Dict[str, Dict[str, List[float]]]]]:
+        """``(process, snapshot)`` for every process still running; snapshots of exited ones are deleted.
+
+        A process is identified as ``pid:start``; an older entry for a pid that has since been reused
+        belongs to an exited process too. ``retention`` bounds entries whose pid cannot be checked.
+        """
+        connection = self._connection()
+        connection.execute("DELETE FROM metric_snapshots WHERE updated_at < ?", (time.time() - retention,))
+        rows = connection.execute("SELECT process, data FROM metric_snapshots ORDER BY updated_at DESC").fetchall()
+        live: List[Tuple[str, Dict[str, Dict[str, List[float]]]]] = []
+        seen = set()
+        dead: List[Tuple[str]] = []
+        for process, data in rows:
+            pid = int(process.split(":", 1)[0])
+            if pid in seen or not _alive(pid):
+                dead.append((process,))
+                continue
+            seen.add(pid)
+            live.append((process, json.loads(data)))
+        if dead:
+            connection.executemany("DELETE FROM metric_snapshots WHERE process = ?", dead)
+        return live
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by another user.
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._store: Optional[MetricsStore] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._process = ""
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # Runs in the child before it records anything: the parent's totals, lock state and
+        # flusher thread must not carry over, or the child would count them twice.
+        self.lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._values.clear()
+        self._thread = None
+        self._pid = None
+        self._process = ""
+
+    def register(self, metric: Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, Dict[str, List[float]]]:
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self._metrics.items() if metric._values}
+
+    def _enabled(self) -> bool:
+        return settings.configured and settings.CAPTCHA_METRICS_ENABLED
+
+    def _get_store(self) -> MetricsStore:
+        if self._store is None:
+            self._store = MetricsStore(str(settings.CAPTCHA_METRICS_DB))
+        return self._store
+
+    def ensure_running(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self.lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._process = f"{pid}:{time.time_ns()}"
+            if not self._enabled():
+                return
+            self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(settings.CAPTCHA_METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._enabled() or not self._process or self._pid != os.getpid():
+            return
+        try:
+            self._get_store().write(self._process, self.snapshot())
+        except sqlite3.Error:
+            logger.exception("Could not write metrics snapshot")
+
+    def collect(self) -> Dict[str, Dict[str, List[float]]]:
+        """Sum the latest snapshot of every live process (this one included) on the host.
+
+        Gauge series are not summed: each process's value is kept under an extra ``pid`` label.
+        """
+        self.ensure_running()
+        snapshots = [(self._process, self.snapshot())]
+        if self._enabled():
+            self.flush()
+            try:
+                snapshots = self._get_store().read_all(settings.CAPTCHA_METRICS_RETENTION)
+            except sqlite3.Error:
+                logger.exception("Could not read metrics snapshots; reporting this process only")
+        merged: Dict[str, Dict[str, List[float]]] = {}
+        for process, snapshot in snapshots:
+            pid = process.split(":", 1)[0]
+            for name, series in snapshot.items():
+                target = merged.setdefault(name, {})
+                gauge = isinstance(self._metrics.get(name), Gauge)
+                for key, values in series.items():
+                    if gauge:
+                        key = _label_key(dict(json.loads(key), pid=pid))
+                    current = target.get(key)
+                    if current is None or len(current) != len(values):
+                        target[key] = list(values)
+                    else:
+                        target[key] = [a + b for a, b in zip(current, values)]
+        return merged
+
+    def exposition(self) -> str:
+        merged = self.collect()
+        lines: List[str] = []
+        for name in sorted(merged):
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key in sorted(merged[name]):
+                labels = json.loads(key)
+                values = merged[name][key]
+                if isinstance(metric, Histogram):
+                    cumulative = 0.0
+                    for bound, count in zip(list(metric.buckets) + ["+Inf"], values[: len(metric.buckets) + 1]):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels + [['le', le]])} {_format_value(cumulative)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {repr(values[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(values[-1])}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(values[0])}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: List[List[str]]) -> str:
+    if not labels:
+        return ""
+    escape = {ord("\\"): "\\\\", ord('"'): '\\"', ord("\n"): "\\n"}
+    return "{" + ",".join(f'{key}="{value.translate(escape)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _authorized(request) -> bool:
+    """A matching bearer token when ``CAPTCHA_METRICS_TOKEN`` is set, otherwise a logged-in staff user."""
+    token = settings.CAPTCHA_METRICS_TOKEN
+    if token:
+        supplied = request.headers.get("Authorization", "")
+        return hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+@require_GET
+def metrics_view(request):
+    if not settings.CAPTCHA_METRICS_ENABLED:
+        return HttpResponse(status=404)
+    if not _authorized(request):
+        return HttpResponse(status=401 if settings.CAPTCHA_METRICS_TOKEN else 403)
+    return HttpResponse(REGISTRY.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,63 +1,202 @@
 from __future__ import annotations
 
+import math
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Callable, Optional
+from functools import wraps
+from typing import Callable, Dict, Iterator
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.conf import settings
 from django.core.cache import cache
 from django.http import HttpRequest, JsonResponse
-from django.utils import timezone
+
+from .metrics import Counter, Histogram
+
+CHECK_SECONDS = Histogram("rate_limit_check_seconds", "Time spent updating rate limit counters.")
+REJECTED = Counter("rate_limit_rejected_total", "Requests rejected with 429 by rate limit prefix.")
+
+# Seconds a token bucket request waits for its client's lock before it is rejected.
+BUCKET_LOCK_WAIT = 0.05
 
 
 @dataclass
 class RateLimitResult:
     allowed: bool
+    limit: int
     remaining: int
     reset_in_seconds: int
 
 
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    strategy: str
+    limit: int
+    window: int
+
+
 def _cache_key(prefix: str, request: HttpRequest) -> str:
     client_ip = request.META.get("HTTP_X_FORWARDED_FOR") or request.META.get("REMOTE_ADDR", "unknown")
     return f"rate-limit:{prefix}:{client_ip}"
 
 
+def _incr(key: str, delta: int, *, timeout: int, initial: int = 0) -> int:
+    """Atomically add ``delta`` to ``key``, seeding it with ``initial`` if it does not exist."""
+    cache.add(key, initial, timeout=timeout)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # The key expired between add() and incr(); start a fresh counter.
+        cache.add(key, initial + delta, timeout=timeout)
+        return initial + delta
+
+
+def _fixed_window(policy: RateLimitPolicy, key: str, now: float) -> RateLimitResult:
+    window_index = int(now // policy.window)
+    count = _incr(f"{key}:{window_index}", 1, timeout=policy.window)
+    reset_in = max(1, math.ceil((window_index + 1) * policy.window - now))
+    return RateLimitResult(count <= policy.limit, policy.limit, max(0, policy.limit - count), reset_in)
+
+
+def _sliding_window(policy: RateLimitPolicy, key: str, now: float) -> RateLimitResult:
+    """Sliding-window counter: the previous window's count is weighted by how much of it still overlaps."""
+    window_index = int(now // policy.window)
+    count = _incr(f"{key}:{window_index}", 1, timeout=policy.window * 2)
+    previous = cache.get(f"{key}:{window_index - 1}", 0)
+    overlap = 1 - (now - window_index * policy.window) / policy.window
+    estimate = previous * overlap + count
+    reset_in = max(1, math.ceil((window_index + 1) * policy.window - now))
+    return RateLimitResult(estimate <= policy.limit, policy.limit, max(0, int(policy.limit - estimate)), reset_in)
+
+
+@contextmanager
+def _lock(key: str) -> Iterator[bool]:
+    """Short mutex on ``cache.add``; yields whether it was acquired within ``BUCKET_LOCK_WAIT``.
+
+    The lock entry expires after a second, so a process that dies while holding it cannot
+    block the key for longer than that.
+    """
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + BUCKET_LOCK_WAIT
+    acquired = cache.add(lock_key, 1, timeout=1)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.002)
+        acquired = cache.add(lock_key, 1, timeout=1)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
+def _token_bucket(policy: RateLimitPolicy, key: str, now: float) -> RateLimitResult:
+    """Token bucket expressed as GCRA over a single integer (the theoretical arrival time in ms).
+
+    A request fits while ``max(arrival, now)`` plus one token interval stays within one full bucket
+    of ``now``; only admitted requests store the new arrival time. The read and write happen under
+    a per-client lock, so concurrent requests cannot all read the same arrival time and all be
+    admitted. A request that cannot get the lock in time is rejected: it is racing other requests
+    from the same client.
+    """
+    now_ms = int(now * 1000)
+    interval = max(1, policy.window * 1000 // policy.limit)
+    burst = interval * policy.limit
+    bucket_key = f"{key}:tb"
+    with _lock(bucket_key) as locked:
+        arrival = max(cache.get(bucket_key, now_ms), now_ms) + interval
+        allowed = locked and arrival - now_ms <= burst
+        if allowed:
+            # Expire once the bucket would be full again so idle clients start fresh.
+            cache.set(bucket_key, arrival, timeout=max(1, math.ceil((arrival - now_ms) / 1000)))
+        else:
+            arrival -= interval
+    remaining = max(0, (burst - (arrival - now_ms)) // interval)
+    if allowed:
+        reset_in = math.ceil((arrival - now_ms) / 1000)
+    else:
+        reset_in = math.ceil((arrival + interval - burst - now_ms) / 1000)
+    return RateLimitResult(allowed, policy.limit, remaining, max(1, reset_in))
+
+
+STRATEGIES: Dict[str, Callable[[RateLimitPolicy, str, float], RateLimitResult]] = {
+    "fixed_window": _fixed_window,
+    "sliding_window": _sliding_window,
+    "token_bucket": _token_bucket,
+}
+
+
+def get_policy(prefix: str) -> RateLimitPolicy:
+    config = getattr(settings, "RATE_LIMITS", {}).get(prefix, {})
+    strategy = config.get("strategy", settings.RATE_LIMIT_STRATEGY)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown rate limit strategy {strategy!r} for {prefix!r}")
+    window = config.get("window", settings.RATE_LIMIT_WINDOW)
+    if hasattr(window, "total_seconds"):
+        window = window.total_seconds()
+    return RateLimitPolicy(
+        strategy=strategy,
+        limit=max(1, int(config.get("limit", settings.RATE_LIMIT_MAX_REQUESTS))),
+        window=max(1, int(window)),
+    )
+
+
+def check_rate_limit(prefix: str, request: HttpRequest, policy: RateLimitPolicy) -> RateLimitResult:
+    with CHECK_SECONDS.time(prefix=prefix, strategy=policy.strategy):
+        result = STRATEGIES[policy.strategy](policy, _cache_key(prefix, request), time.time())
+    if not result.allowed:
+        REJECTED.inc(prefix=prefix)
+    return result
+
+
+def _apply_headers(response, result: RateLimitResult) -> None:
+    response["X-RateLimit-Limit"] = str(result.limit)
+    response["X-RateLimit-Remaining"] = str(result.remaining)
+    response["X-RateLimit-Reset"] = str(result.reset_in_seconds)
+
+
+def _limited_response(result: RateLimitResult) -> JsonResponse:
+    response = JsonResponse(
+        {
+            "success": False,
+            "message": "Too many requests. Please wait before retrying.",
+            "reset_in": result.reset_in_seconds,
+        },
+        status=429,
+    )
+    response["Retry-After"] = str(result.reset_in_seconds)
+    return response
+
+
 def rate_limit(prefix: str) -> Callable[[Callable[..., JsonResponse]], Callable[..., JsonResponse]]:
-    window = int(settings.RATE_LIMIT_WINDOW.total_seconds())
-    max_requests = settings.RATE_LIMIT_MAX_REQUESTS
+    policy = get_policy(prefix)
 
     def decorator(view_func: Callable[..., JsonResponse]) -> Callable[..., JsonResponse]:
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapped(request: HttpRequest, *args, **kwargs):
+                # Cache backends may block on the network, so the counters run in a worker thread.
+                result = await sync_to_async(check_rate_limit, thread_sensitive=False)(prefix, request, policy)
+                if result.allowed:
+                    response = await view_func(request, *args, **kwargs)
+                else:
+                    response = _limited_response(result)
+                _apply_headers(response, result)
+                return response
+
+            return async_wrapped
+
+        @wraps(view_func)
         def wrapped(request: HttpRequest, *args, **kwargs):
-            key = _cache_key(prefix, request)
-            now = timezone.now()
-            record: Optional[dict] = cache.get(key)
-
-            if record and record["expires_at"] > now:
-                count = record["count"]
-                if count >= max_requests:
-                    reset_in = int((record["expires_at"] - now).total_seconds())
-                    return JsonResponse(
-                        {
-                            "success": False,
-                            "message": "Too many requests. Please wait before retrying.",
-                            "reset_in": reset_in,
-                        },
-                        status=429,
-                    )
-                cache.set(
-                    key,
-                    {"count": count + 1, "expires_at": record["expires_at"]},
-                    timeout=reset_timeout(record["expires_at"], now),
-                )
+            result = check_rate_limit(prefix, request, policy)
+            if result.allowed:
+                response = view_func(request, *args, **kwargs)
             else:
-                expires_at = now + settings.RATE_LIMIT_WINDOW
-                cache.set(key, {"count": 1, "expires_at": expires_at}, timeout=window)
-
-            return view_func(request, *args, **kwargs)
+                response = _limited_response(result)
+            _apply_headers(response, result)
+            return response
 
         return wrapped
 
     return decorator
-
-
-def reset_timeout(expires_at, now):
-    return max(1, int((expires_at - now).total_seconds()))
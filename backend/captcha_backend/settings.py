@@ -121,3 +121,107 @@ SESSION_COOKIE_AGE = 60 * 60 * 2
 
 RATE_LIMIT_WINDOW = timedelta(minutes=1)
 RATE_LIMIT_MAX_REQUESTS = 10
+# One of "fixed_window", "sliding_window" or "token_bucket"; RATE_LIMITS overrides per prefix.
+RATE_LIMIT_STRATEGY = "sliding_window"
+RATE_LIMITS = {
+    "login": {"strategy": "sliding_window", "limit": 10, "window": 60},
+    "register": {"strategy": "token_bucket", "limit": 10, "window": 60},
+}
+
+# Pre-rendered captcha pool: a daemon thread per process keeps each variant topped up so
+# /api/captcha/request only pops a challenge; an empty pool falls back to synchronous rendering.
+CAPTCHA_POOL_ENABLED = os.environ.get("CAPTCHA_POOL_ENABLED", "true").lower() == "true"
+CAPTCHA_POOL_SIZE = int(os.environ.get("CAPTCHA_POOL_SIZE", "200"))
+CAPTCHA_POOL_LOW_WATERMARK = int(os.environ.get("CAPTCHA_POOL_LOW_WATERMARK", "50"))
+CAPTCHA_POOL_REFILL_BATCH = 20
+CAPTCHA_POOL_REFILL_INTERVAL = 1.0
+CAPTCHA_POOL_MAX_SPECS = 8
+
+# "local" renders in the calling thread; "process" fans batches out to a process pool.
+CAPTCHA_RENDERER = os.environ.get("CAPTCHA_RENDERER", "local").lower()
+CAPTCHA_RENDER_WORKERS = int(os.environ.get("CAPTCHA_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+
+# "inline" embeds images as base64 data URIs; "url" returns short-lived /api/captcha/image/... links.
+# Clients may override per request with the "image_mode" field.
+CAPTCHA_IMAGE_MODE = os.environ.get("CAPTCHA_IMAGE_MODE", "inline").lower()
+
+# Captcha logs are queued in-process and written with bulk_create every N rows or T milliseconds.
+# Overflow policy when the queue is full: "sync" (write inline), "drop" or "block".
+CAPTCHA_LOG_ASYNC = os.environ.get("CAPTCHA_LOG_ASYNC", "true").lower() == "true"
+CAPTCHA_LOG_BATCH_SIZE = 200
+CAPTCHA_LOG_FLUSH_INTERVAL_MS = 500
+CAPTCHA_LOG_QUEUE_SIZE = 10000
+CAPTCHA_LOG_OVERFLOW = os.environ.get("CAPTCHA_LOG_OVERFLOW", "sync").lower()
+
+# Logs older than the retention period are moved to gzip NDJSON files by `manage.py archive_logs`.
+CAPTCHA_LOG_RETENTION_DAYS = int(os.environ.get("CAPTCHA_LOG_RETENTION_DAYS", "30"))
+CAPTCHA_LOG_ARCHIVE_DIR = Path(os.environ.get("CAPTCHA_LOG_ARCHIVE_DIR", str(BASE_DIR / "archive")))
+
+# CaptchaType catalog: seconds a process trusts its copy before re-checking the shared version
+# (kept in the token store), how long the row snapshot stays cached, and the safety-net reload age.
+CAPTCHA_CATALOG_LOCAL_TTL = 1.0
+CAPTCHA_CATALOG_SHARED_TTL = 60 * 60
+CAPTCHA_CATALOG_MAX_AGE = 60
+
+# Scene challenges: images shown per grid and how many of them belong to the target category.
+CAPTCHA_SCENE_GRID_SIZE = 9
+CAPTCHA_SCENE_MIN_TARGETS = 2
+CAPTCHA_SCENE_MAX_TARGETS = 5
+# Safety-net reload interval for the in-memory scene image index (seconds).
+CAPTCHA_SCENE_INDEX_TTL = 300
+# Scene challenges are served as one sprite of square thumbnails; decoded thumbnails are kept in a
+# per-process LRU cache of this many entries.
+CAPTCHA_SCENE_THUMBNAIL_SIZE = 96
+CAPTCHA_SCENE_THUMBNAIL_CACHE_SIZE = 1024
+# Where `manage.py ingest_scene_images` writes the pre-sized thumbnails (named by content hash).
+CAPTCHA_SCENE_THUMBNAIL_DIR = MEDIA_ROOT / "scene_thumbnails"
+
+# Route /api/captcha/request, /verify and /api/auth/login to their async variants.
+# asgi.py turns this on by default; WSGI deployments keep the synchronous views.
+CAPTCHA_ASYNC_VIEWS = os.environ.get("CAPTCHA_ASYNC_VIEWS", "false").lower() == "true"
+
+# Where issued captcha answers and url-mode images live until verified. The default SQLite file is
+# shared by every worker process on this host; use redis://host:6379/0 for multi-host deployments
+# or cache://default to keep them in the Django cache.
+CAPTCHA_TOKEN_STORE_URL = os.environ.get(
+    "CAPTCHA_TOKEN_STORE_URL", f"sqlite:///{BASE_DIR / 'captcha_tokens.sqlite3'}"
+)
+
+# Wrong answers allowed per captcha token; the token is discarded when the limit is reached.
+CAPTCHA_MAX_ATTEMPTS = int(os.environ.get("CAPTCHA_MAX_ATTEMPTS", "3"))
+
+# "store" keeps each issued answer in the token store; "signed" puts a keyed hash of the answer
+# inside an expiring token signed (and, if `cryptography` is installed, encrypted) with SECRET_KEY,
+# so issuing writes nothing and only a spent marker per verified token is stored.
+CAPTCHA_TOKEN_MODE = os.environ.get("CAPTCHA_TOKEN_MODE", "store").lower()
+CAPTCHA_SIGNED_TOKEN_ENCRYPT = True
+
+# Background/noise engine for rendered captchas: "pil" draws lines and ellipses with Pillow;
+# "numpy" (or "auto") uses the vectorised pipeline with gradient, speckle and wave warp when numpy
+# is installed, falling back to "pil" otherwise. Overridable per type via config_json "noise".
+CAPTCHA_NOISE_ENGINE = os.environ.get("CAPTCHA_NOISE_ENGINE", "pil").lower()
+
+# Hot-path timing histograms exposed in Prometheus text format at /api/metrics. Each worker
+# process writes its totals to the SQLite file every flush interval; the endpoint sums the
+# processes that are still running and have written within the retention window (a backstop for
+# workers whose pid cannot be checked from here), listing gauges per process. Scrapers authenticate with a bearer token when
+# CAPTCHA_METRICS_TOKEN is set; without one the endpoint only serves logged-in staff users.
+CAPTCHA_METRICS_ENABLED = os.environ.get("CAPTCHA_METRICS_ENABLED", "true").lower() == "true"
+CAPTCHA_METRICS_DB = Path(os.environ.get("CAPTCHA_METRICS_DB", str(BASE_DIR / "captcha_metrics.sqlite3")))
+CAPTCHA_METRICS_FLUSH_INTERVAL = 5.0
+CAPTCHA_METRICS_RETENTION = 60.0
+CAPTCHA_METRICS_TOKEN = os.environ.get("CAPTCHA_METRICS_TOKEN", "")
+
+# Slider backgrounds are cropped from a small in-memory tile library. Tiles come from the slider
+# CaptchaType's image_path, else this file or directory (relative paths are under MEDIA_ROOT),
+# else a few tiles synthesised at startup with CAPTCHA_NOISE_ENGINE.
+CAPTCHA_SLIDER_BACKGROUNDS = os.environ.get("CAPTCHA_SLIDER_BACKGROUNDS", "")
+
+# Password hashing (login and register) runs on a bounded thread pool per process. When
+# workers + max queue hashes are already in flight, requests get 503 with Retry-After seconds.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "16"))
+PASSWORD_HASH_RETRY_AFTER = 1
+
+# Seconds a login for an unknown username is answered from the token store without a database query.
+LOGIN_UNKNOWN_USER_TTL = 30
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("accounts.urls")),
     path("api/captcha/", include("captcha_api.urls")),
     path("api/activity/", include("activity.urls")),
+    path("api/metrics", metrics_view, name="metrics"),
 ]
@@ -1,7 +1,11 @@
 import http from './http'
 
-export async function requestCaptcha ({ type = 'text', config = {} } = {}) {
-  const response = await http.post('/captcha/request', { type, config })
+export async function requestCaptcha ({ type = 'text', config = {}, imageMode } = {}) {
+  const body = { type, config }
+  if (imageMode) {
+    body.image_mode = imageMode
+  }
+  const response = await http.post('/captcha/request', body)
   if (response.success) {
     return {
       token: response.token,